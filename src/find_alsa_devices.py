@@ -10,15 +10,14 @@ import shutil
 import subprocess
 import argparse
 from argparse import RawTextHelpFormatter
-from struct import unpack as st_unpack
-from numpy import array
-from matplotlib.mlab import psd as mlab_psd
 from pprint import pprint
 import pandas as pd     # python3 -m pip install pandas
 import numpy as np
 
 from supersid_config import read_config, CONFIG_FILE_NAME
 from supersid_common import exist_file, slugify
+from supersid_pcm import FORMAT_LENGTHS as PCM_FORMAT_LENGTHS, decode_pcm
+from supersid_psd import psd
 from supersid_isine import SinePlayer
 
 
@@ -580,37 +579,19 @@ try:
                 assert (len(raw_data) >= (framesize * rate)), \
                     "expected number of bytes to be framesize * rate"
                 asound_format = ALSAAUDIO_2_ASOUND_FORMATS[format]
-                if asound_format == 'S16_LE':
-                    unpacked_data = array(st_unpack(
-                        "<%ih" % (rate * channels),
-                        raw_data[:framesize * rate]))
-                elif asound_format == 'S24_3LE':
-                    unpacked_data = []
-                    for i in range(rate * channels):
-                        chunk = raw_data[i*3:i*3+3]
-                        unpacked_data.append(st_unpack(
-                            '<i',
-                            chunk + (b'\0' if chunk[2] < 128 else b'\xff'))[0])
-                    unpacked_data = array(unpacked_data)
-                elif asound_format == 'S32_LE':
-                    unpacked_data = array(st_unpack(
-                        "<%ii" % (rate * channels),
-                        raw_data[:framesize * rate]))
-                else:
+                if asound_format not in PCM_FORMAT_LENGTHS:
                     print(
                         "\tERROR: format conversion of '{}' is not implemented"
                         .format(asound_format))
                     return self.F_NOT_IMPLEMENTED, None, None, None
-                assert (len(unpacked_data) == (rate * channels)), \
+                unpacked_data = decode_pcm(
+                    raw_data, asound_format, channels, rate)
+                assert (unpacked_data.size == (rate * channels)), \
                     "expected number of samples to be sample rate * channels"
-                # for 1 channel the format now is [left, ..., left]
-                # for 2 channels the format now is [left, right,
-                #                                   ..., left, right]
 
-                if min(unpacked_data) == max(unpacked_data):
+                if unpacked_data.min() == unpacked_data.max():
                     return self.E_RECORDED_ALL_ZEROS, None, None, None
 
-                unpacked_data = unpacked_data.reshape((rate, channels))
                 # for 1 channel the format now is [[left], ..., [left]]
                 # for 2 channels the format now is [[left, right],
                 #                                   ..., [left, right]]
@@ -630,7 +611,7 @@ try:
 
                 peak_freq = []
                 for channel in range(channels):
-                    Pxx, freqs = mlab_psd(
+                    Pxx, freqs = psd(
                         unpacked_data[:, channel],
                         NFFT,
                         rate)
@@ -14,8 +14,11 @@ Licence:     <your licence>
 Script's Arguments:
 -c|--config supersid.cfg : the configuration file for its [FTP]
    and [PARAMETERS] sections
--y|--yesterday : to send yesterday's superSID file
-    [data_path/<monitor_id>_YYYY_MM_DD.csv]
+-y|--yesterday : to send yesterday's superSID file of the site
+    [data_path/<site_name>_YYYY-MM-DD.csv or .sidb], found in the index
+    of data_path
+--archive-index sidarchive.sqlite : index of data_path,
+    default data_path/sidarchive.sqlite
 [filename1 filename2 ...]: optional list of files to send
 
 Section in the configuration file:
@@ -29,11 +32,12 @@ call_signs = NWC
 
 """
 import sys
+import copy
 import argparse
 from os import path
 import ftplib
 from datetime import datetime, timezone, timedelta
-from sidfile import SidFile
+from sidarchive import SidArchive
 from supersid_config import read_config, FILTERED, RAW, CONFIG_FILE_NAME
 from supersid_common import exist_file
 
@@ -52,6 +56,12 @@ if __name__ == '__main__':
         dest="askYesterday",
         default=False,
         help="Yesterday's date is used for the file name.")
+    parser.add_argument(
+        "--archive-index",
+        dest="archive_index",
+        default=None,
+        help="SQLite index of the data folder, "
+        "default=sidarchive.sqlite in data_path")
     parser.add_argument(
         'file_list',
         metavar='file.csv',
@@ -71,18 +81,33 @@ if __name__ == '__main__':
         if cfg['call_signs'] \
         else [s['call_sign'] for s in cfg.stations]  # i.e. else all stations
     # file list
+    archive = SidArchive(cfg['data_path'], args.archive_index)
+    archive.update()
     if args.askYesterday:
-        yesterday = datetime.now(timezone.utc) - timedelta(days=1)
-        args.file_list.append(
-            path.normpath(f"{cfg['data_path']}{path.sep}{cfg['site_name']}_{yesterday.year}-"
-                          f"{yesterday.month:02d}-{yesterday.day:02d}.csv"))
-        print(f"Yesterday file: {args.file_list[-1]}")
+        yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date()
+        # the SuperSID file of the site, .sidb preferred over .csv
+        rows = sorted(
+            [row for row in archive.files(start=yesterday,
+                                          end=yesterday + timedelta(days=1))
+             if row['site'] == cfg['site_name']
+             and row['format'] in ("sidb", "supersid")],
+            key=lambda row: SidArchive.FORMATS.index(row['format']))
+        if rows:
+            args.file_list.append(rows[0]['path'])
+            print(f"Yesterday file: {args.file_list[-1]}")
+        else:
+            print(f"Error: no file of {yesterday} found in "
+                  f"{cfg['data_path']}")
 
     # generate all the SID files ready to send in the local_tmp file
     files_to_send = []  # TODO: remove files_to_send
     for input_file in args.file_list:
         if path.isfile(input_file):
-            sid = SidFile(input_file, force_read_timestamp=True)
+            # the archive shares the parsed file, modify a copy
+            sid = copy.copy(archive.load(input_file,
+                                         force_read_timestamp=True))
+            sid.sid_params = dict(sid.sid_params)
+            sid.data = sid.data.copy()
             if sid.sid_params['contact'] == "" and cfg['contact'] != "":
                 sid.sid_params['contact'] = cfg['contact']
             # print(sid.sid_params)
@@ -123,6 +148,7 @@ if __name__ == '__main__':
 
         else:
             print("Error:", input_file, "does not exist.")
+    archive.close()
 
     # TODO: fill files_to_send with
     # glob.glob("{}{}{}*.csv"
@@ -66,11 +66,25 @@ import ftplib
 import os
 from os import path
 import time
+import threading
 from datetime import datetime, date, timezone, timedelta
 from supersid_common import script_relative_to_cwd_relative
 
 NOAA_CACHE_DIR_DEFAULT = "../Private"
 
+# Several threads may create NOAA_flares objects at the same time, for
+# example the days of the same year share one NGDC file. The retrieval,
+# the parsing and the purge of a cache file are serialized by its lock.
+_cache_locks = {}   # absolute path of a cache file -> threading.Lock
+_cache_locks_guard = threading.Lock()
+
+
+def cache_lock(file_path):
+    """Return the lock of a cache file for the threads of this process."""
+    with _cache_locks_guard:
+        return _cache_locks.setdefault(path.abspath(file_path),
+                                       threading.Lock())
+
 class NOAA_flares:
     """This object carries a list of all x-ray flare events of a given day."""
     def __init__(self, day,
@@ -119,15 +133,19 @@ class NOAA_flares:
         # Decide how to fetch the data based on the date.
         if int(self.day[:4]) >= 2017:
             # given day is 2017 or later --> fetch data by FTP
-            file = self.ftp_fetch_swpc()
-            self.parse_swpc_event_file(file)
+            with cache_lock(path.join(self.cache_path,
+                                      f"{self.day}events.txt")):
+                file = self.ftp_fetch_swpc()
+                self.parse_swpc_event_file(file)
         else:
             # Given day is 2016 or earlier --> fetch data by https
             # If the file is NOT in the self.cache_path directory then we need to
             # fetch it first then read line by line to grab the data
             # from the expected day
-            file_path = self.http_fetch_ngdc()
-            self.parse_ngdc_file(file_path)
+            with cache_lock(path.join(self.cache_path,
+                                      self.ngdc_file_name())):
+                file_path = self.http_fetch_ngdc()
+                self.parse_ngdc_file(file_path)
 
     def parse_ngdc_file(self, file_path):
         """ Parse the goes-xrs-report file retrieved from website
@@ -168,6 +186,12 @@ class NOAA_flares:
         # "201501311702" -> datetime(2015, 1, 31, 17, 2)
         return datetime.strptime(self.day + hhmm, "%Y%m%d%H%M")
 
+    def ngdc_file_name(self):
+        """Return the name of the NGDC file of the year of the day."""
+        if self.day[:4] != "2015":
+            return f"goes-xrs-report_{self.day[:4]}.txt"
+        return "goes-xrs-report_2015_modifiedreplacedmissingrows.txt"
+
     def http_fetch_ngdc(self):
         """
         Get the file for the year from HTTP ngdc if not already saved.
@@ -178,10 +202,7 @@ class NOAA_flares:
         ngdc_url = (f"https://{ngdc_host}/stp/space-weather/"
                     "solar-data/solar-features/solar-flares/x-rays/goes/xrs/")
 
-        if self.day[:4] != "2015":
-            file_name = f"goes-xrs-report_{self.day[:4]}.txt"
-        else:
-            file_name = "goes-xrs-report_2015_modifiedreplacedmissingrows.txt"
+        file_name = self.ngdc_file_name()
 
         folder = self.cache_path
         file_path = path.join(folder, file_name)
@@ -197,8 +218,11 @@ class NOAA_flares:
                 print(f"Cannot retrieve the file {file_name} from URL: {url}")
                 print(f"Error: {err}\n")
             else:
-                with open(file_path, "wt", encoding="utf-8") as fout:
+                # a complete file or none for the readers of the cache
+                part_path = f"{file_path}.{os.getpid()}.part"
+                with open(part_path, "wt", encoding="utf-8") as fout:
                     fout.write(txt)
+                os.replace(part_path, file_path)
         return file_path
 
     def ftp_fetch_swpc(self):
@@ -217,17 +241,20 @@ class NOAA_flares:
             print(f"Cache file {local_file} already exists")
         else:
             print(f"Downloading {local_file} from {noaa_ftp_host}")
+            # a complete file or none for the readers of the cache
+            part_file = f"{local_file}.{os.getpid()}.part"
             try:
                 ftp = ftplib.FTP(noaa_ftp_host)
                 ftp.login(user='anonymous', passwd='example@example.com')
                 ftp_command = f"RETR {noaa_ftp_path}"
-                with open(local_file, 'wb') as local_fd:
+                with open(part_file, 'wb') as local_fd:
                     ftp.retrbinary(ftp_command, local_fd.write)
                 ftp.quit()
+                os.replace(part_file, local_file)
             except ftplib.all_errors as err:
                 print(f"Can't retrieve FTP file {noaa_ftp_host}/{noaa_ftp_path}: {err}")
-                if os.path.exists(local_file):
-                    os.remove(local_file) # don't leave empty file in cache folder
+                if os.path.exists(part_file):
+                    os.remove(part_file) # don't leave empty file in cache folder
         return local_file
 
     def parse_swpc_event_file(self,local_file):
@@ -349,7 +376,9 @@ class NOAA_flares:
                 continue
 
             try:
-                os.remove(file_path)
+                # not while another thread retrieves or parses it
+                with cache_lock(file_path):
+                    os.remove(file_path)
                 print(f"Deleted: {file_path}")
             except OSError as err:
                 print(f"Error deleting {file_path}: {err}")
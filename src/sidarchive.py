@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Indexed archive of the SID and SuperSID files of a data directory.
+
+SidArchive keeps an index of the files in a SQLite database, by default
+"sidarchive.sqlite" in the data folder: site, date, log interval, format,
+modification time and the stations of each file. Only the headers are read
+to build it, and update() reads the headers of new or modified files only.
+One index may hold the files of several folders.
+
+query(stations, start, end) returns the readings of the stations on one
+regular time axis, stitched together from the daily files. Parsed files
+are kept in a bounded LRU cache keyed by path and modification time, a
+modified file is parsed again.
+
+    archive = SidArchive("../Data/")
+    archive.update()
+    timestamps, data = archive.query(["NAA", "NLK"],
+                                     "2026-10-01", "2026-10-08")
+
+Running this module directly updates the index and prints its content or
+the result of a query.
+"""
+import os
+import sys
+import time
+import glob
+import sqlite3
+import argparse
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import numpy
+
+from sidfile import SidFile, SidBinary, SIDB_EXTENSION, to_datetime64
+
+
+def to_datetime64_day(day):
+    """Return day (str, date, datetime, numpy.datetime64) as datetime64[us]."""
+    if isinstance(day, str):
+        return numpy.datetime64(day.replace(" ", "T"), 'us')
+    return to_datetime64(day)
+
+
+class SidArchive():
+    """Index and cache of the SID/SuperSID files of data folders."""
+
+    INDEX_FILENAME = "sidarchive.sqlite"
+    PATTERNS = ("*.csv", "*" + SIDB_EXTENSION)
+    CACHE_SIZE = 32     # parsed files kept in memory
+    # preferred source when several files hold a station for the same day:
+    # the binary container is the fastest to read, the hourly save of the
+    # current day the last resort
+    FORMATS = ("sidb", "supersid", "sid", "hourly")
+
+    def __init__(self, data_path, index_filename=None,
+                 cache_size=CACHE_SIZE):
+        self.data_path = data_path
+        self.index_filename = index_filename \
+            or os.path.join(data_path, self.INDEX_FILENAME)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (path, mtime, force) -> SidFile
+        self.db = sqlite3.connect(self.index_filename)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, mtime REAL, site TEXT, date TEXT, "
+                "interval INTEGER, format TEXT, extended INTEGER)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS stations ("
+                "path TEXT, station TEXT, PRIMARY KEY (path, station))")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS stations_station "
+                "ON stations (station)")
+
+    def close(self):
+        self.db.close()
+
+    @classmethod
+    def get_format(cls, filename, sid_file):
+        if filename.endswith(SIDB_EXTENSION):
+            return "sidb"
+        if os.path.basename(filename).startswith("hourly_current_buffers"):
+            return "hourly"
+        return "supersid" if sid_file.isSuperSID else "sid"
+
+    @classmethod
+    def is_sid_file(cls, filename):
+        """Cheap check of the first bytes: SidFile exits on other files."""
+        try:
+            with open(filename, "rb") as fin:
+                start = fin.read(len(SidBinary.MAGIC))
+        except OSError:
+            return False
+        return start.startswith(b"#") or start == SidBinary.MAGIC
+
+    def update(self, data_path=None):
+        """Index new and modified files, forget deleted ones.
+
+        data_path is the folder to index, default the one of the archive.
+        Return the number of files added or updated and removed.
+        """
+        folder = os.path.abspath(data_path or self.data_path)
+        indexed = {path: mtime for path, mtime in self.db.execute(
+                       "SELECT path, mtime FROM files")
+                   if os.path.dirname(path) == folder}
+        found = set()
+        updated = 0
+        with self.db:
+            for pattern in self.PATTERNS:
+                for filename in glob.glob(os.path.join(folder, pattern)):
+                    path = os.path.abspath(filename)
+                    mtime = os.path.getmtime(path)
+                    found.add(path)
+                    if indexed.get(path) == mtime \
+                            or not self.is_sid_file(path):
+                        continue
+                    try:
+                        sid_file = SidFile(path, lazy=True)
+                    except (SystemExit, ValueError, KeyError,
+                            UnicodeDecodeError) as err:
+                        print(f"Warning: {path} skipped, {err}")
+                        continue
+                    self.remove(path)
+                    self.db.execute(
+                        "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (path, mtime,
+                         sid_file.sid_params.get(
+                             'site', sid_file.sid_params.get('site_name')),
+                         sid_file.sid_params['utc_starttime'][:10],
+                         sid_file.LogInterval,
+                         self.get_format(path, sid_file),
+                         int(sid_file.is_extended)))
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO stations VALUES (?, ?)",
+                        [(path, station) for station in sid_file.stations])
+                    updated += 1
+            removed = set(indexed) - found
+            for path in removed:
+                self.remove(path)
+        return updated, len(removed)
+
+    def remove(self, path):
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.db.execute("DELETE FROM stations WHERE path = ?", (path,))
+
+    def stations(self):
+        """Return the sorted list of all indexed stations."""
+        return [station for station, in self.db.execute(
+            "SELECT DISTINCT station FROM stations ORDER BY station")]
+
+    def files(self, stations=None, start=None, end=None, paths=None):
+        """Return the index rows as dictionaries.
+
+        Filtered by stations, by the days from start to before end and by
+        the absolute paths, sorted by date and path.
+        """
+        sql = "SELECT DISTINCT files.* FROM files " \
+            "JOIN stations ON files.path = stations.path WHERE 1"
+        parameters = []
+        if paths is not None:
+            sql += " AND files.path IN (%s)" % ",".join("?" * len(paths))
+            parameters += list(paths)
+        if stations is not None:
+            sql += " AND station IN (%s)" % ",".join("?" * len(stations))
+            parameters += list(stations)
+        if start is not None:
+            sql += " AND date >= ?"
+            parameters.append(
+                str(to_datetime64_day(start).astype('datetime64[D]')))
+        if end is not None:
+            sql += " AND date <= ?"
+            parameters.append(str(
+                (to_datetime64_day(end) - numpy.timedelta64(1, 'us'))
+                .astype('datetime64[D]')))
+        sql += " ORDER BY date, path"
+        cursor = self.db.execute(sql, parameters)
+        columns = [description[0] for description in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor]
+        for row in rows:
+            row['stations'] = [station for station, in self.db.execute(
+                "SELECT station FROM stations WHERE path = ?",
+                (row['path'],))]
+        return rows
+
+    def load(self, path, force_read_timestamp=False):
+        """Return the SidFile of path, parsed once per modification time.
+
+        The SidFile is shared with later calls, it must not be modified.
+        """
+        key = (os.path.abspath(path), os.path.getmtime(path),
+               force_read_timestamp)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        sid_file = SidFile(path, force_read_timestamp=force_read_timestamp)
+        self.cache[key] = sid_file
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return sid_file
+
+    def query(self, stations, start, end, interval=None):
+        """Return timestamps, data of the stations from start to before end.
+
+        timestamps is the regular time axis start + i * interval (seconds,
+        default the smallest log interval of the files), data has one row
+        per station. Each reading is placed at the nearest point of the
+        axis, points without reading are NaN.
+        """
+        start, end = to_datetime64_day(start), to_datetime64_day(end)
+        files = self.files(stations, start, end)
+        if interval is None:
+            interval = min([row['interval'] for row in files] or [5])
+        step = numpy.timedelta64(round(interval * 1000000), 'us')
+        timestamps = numpy.arange(start, end, step)
+        data = numpy.full((len(stations), len(timestamps)), numpy.nan)
+        # one file per (station, day), the preferred format first
+        sources = {}
+        for row in sorted(files,
+                          key=lambda row: self.FORMATS.index(row['format'])):
+            for station in row['stations']:
+                sources.setdefault((station, row['date']), row['path'])
+        for i_station, station in enumerate(stations):
+            for (source_station, _), path in sorted(sources.items()):
+                if source_station != station:
+                    continue
+                sid_file = self.load(path)
+                indices = numpy.rint(
+                    (sid_file.timestamp - start) / step).astype(int)
+                selected = (indices >= 0) & (indices < len(timestamps))
+                data[i_station, indices[selected]] = \
+                    sid_file.get_station_data(station)[selected]
+        return timestamps, data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Index the SID files of a folder, query stations")
+    parser.add_argument(
+        "data_path",
+        help="folder of the SID/SuperSID files")
+    parser.add_argument(
+        "-x", "--index",
+        dest="index_filename",
+        help="SQLite index file, default=sidarchive.sqlite in data_path")
+    parser.add_argument(
+        "-s", "--stations",
+        nargs="*",
+        help="stations to query, list the index if omitted")
+    parser.add_argument(
+        "--start",
+        help="first day or time of the query, default=yesterday")
+    parser.add_argument(
+        "--end",
+        help="end (excluded) of the query, default=start + 1 day")
+    args = parser.parse_args()
+
+    archive = SidArchive(args.data_path, args.index_filename)
+    t_start = time.perf_counter()
+    updated, removed = archive.update()
+    print(f"{updated} files indexed, {removed} removed in "
+          f"{time.perf_counter() - t_start:.2f} s")
+    if not args.stations:
+        for row in archive.files():
+            print(row['date'], row['format'], row['interval'],
+                  ",".join(row['stations']), row['path'])
+        sys.exit(0)
+    start = args.start or (datetime.now(timezone.utc).date()
+                           - timedelta(days=1)).isoformat()
+    end = args.end or str(to_datetime64_day(start).astype('datetime64[D]')
+                          + numpy.timedelta64(1, 'D'))
+    for attempt in ("parse", "cached"):
+        t_start = time.perf_counter()
+        timestamps, data = archive.query(args.stations, start, end)
+        print(f"{attempt}: {len(timestamps)} readings x {len(args.stations)}"
+              f" stations in {time.perf_counter() - t_start:.2f} s")
+    for station, values in zip(args.stations, data):
+        print(f"{station}: {numpy.count_nonzero(~numpy.isnan(values))} "
+              f"readings")
+    archive.close()
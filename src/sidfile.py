@@ -16,8 +16,20 @@ Licence:     Open to All
 20150801:
     - truncate ['utc_starttime'] to 19 chars
 """
-from datetime import datetime, timezone, timedelta
+import io
+import os
+import copy
+import zlib
+import lzma
+import struct
+import itertools
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import numpy
+try:
+    import pandas   # fast C parser for the data lines
+except ImportError:
+    pandas = None
 
 from supersid_config import FILTERED, RAW
 from supersid_common import exist_file
@@ -36,6 +48,372 @@ Provide some utilities to manipulate SID/SuperSID files:
 """
 
 
+WRITE_BUFFER_SIZE = 1 << 20    # bytes buffered before writing to the file
+WRITE_CHUNK_ROWS = 4096     # data lines formatted in one go
+SIDB_EXTENSION = ".sidb"    # SidBinary files, any other extension is CSV
+CHUNK_ROWS = 8192   # readings per chunk of SidFile.iter_chunks()
+
+
+@contextmanager
+def atomic_write(filename, binary=False):
+    """Write to a temporary file, rename it to filename once complete.
+
+    Readers of filename never see a partially written file.
+    """
+    tmp_filename = filename + ".tmp"
+    try:
+        with open(tmp_filename, "wb" if binary else "wt",
+                  buffering=WRITE_BUFFER_SIZE) as fout:
+            yield fout
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+
+def write_rows(fout, data, timestamps=None, chunk_rows=WRITE_CHUNK_ROWS):
+    """Write the data lines "[timestamp, ]value, value, ..." to fout.
+
+    data has one row per column of the file, timestamps are the formatted
+    time stamps or None. The values are written with "%.15f", the lines of
+    one chunk are formatted by a single '%' operation on the repeated line
+    format.
+    """
+    data = numpy.atleast_2d(numpy.asarray(data, dtype=float))
+    line_format = ", ".join(["%.15f"] * len(data)) + "\n"
+    columns = list(data)
+    if timestamps is not None:
+        line_format = "%s, " + line_format
+        columns.insert(0, numpy.asarray(timestamps, dtype=object))
+    for start in range(0, data.shape[1], chunk_rows):
+        rows = zip(*[column[start:start + chunk_rows].tolist()
+                     for column in columns])
+        values = tuple(itertools.chain.from_iterable(rows))
+        fout.write(line_format * (len(values) // len(columns)) % values)
+
+
+def to_datetime64(timestamp):
+    """Return timestamp(s) as numpy.datetime64[us] in UTC.
+
+    timestamp may be a datetime, naive means UTC, a numpy.datetime64 or an
+    array of them.
+    """
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc) \
+                .replace(tzinfo=None)
+        return numpy.datetime64(timestamp, 'us')
+    return numpy.asarray(timestamp).astype('datetime64[us]')
+
+
+# fixed width layout of "%Y-%m-%d %H:%M:%S" and "%Y-%m-%d %H:%M:%S.%f"
+_SEPARATORS = {4: b'-', 7: b'-', 10: b' ', 13: b':', 16: b':', 19: b'.'}
+
+
+def parse_timestamps(timestamps):
+    """Return the timestamp strings as numpy.datetime64[us] array.
+
+    The fixed width layouts "YYYY-MM-DD HH:MM:SS" and
+    "YYYY-MM-DD HH:MM:SS.ffffff" are converted with integer arithmetic on
+    the characters, any other layout with numpy's ISO 8601 parser.
+    """
+    timestamps = numpy.asarray(timestamps).astype(bytes)
+    if not len(timestamps):
+        return numpy.empty(0, dtype='datetime64[us]')
+    width = timestamps.dtype.itemsize
+    if width in (19, 26):
+        chars = timestamps.view(numpy.uint8).reshape((-1, width))
+        separators = [position for position in _SEPARATORS
+                      if position < width]
+        digit_columns = [column for column in range(width)
+                         if column not in separators]
+        digits = chars[:, digit_columns] - numpy.uint8(ord('0'))
+        if ((digits <= 9).all()
+                and all((chars[:, position]
+                         == ord(_SEPARATORS[position])).all()
+                        for position in separators)):
+            # the digits of one field are consecutive columns in 'digits'
+            def number(start, stop):
+                weights = 10 ** numpy.arange(stop - start - 1, -1, -1)
+                return digits[:, start:stop] @ weights
+            months = (number(0, 4) - 1970) * 12 + number(4, 6) - 1
+            days = months.astype('datetime64[M]').astype('datetime64[D]') \
+                + (number(6, 8) - 1)
+            seconds = number(8, 10) * 3600 + number(10, 12) * 60 \
+                + number(12, 14)
+            microseconds = seconds * 1000000
+            if width == 26:
+                microseconds += number(14, 20)
+            return days.astype('datetime64[us]') \
+                + microseconds.astype('timedelta64[us]')
+    return numpy.char.replace(numpy.char.strip(timestamps), b' ', b'T') \
+        .astype('datetime64[us]')
+
+
+def iter_columns(fin, usecols, timestamp=False, chunk_lines=100000):
+    """Yield timestamps, values for chunks of the data lines of fin.
+
+    usecols are the indices of the float columns, values has one row per
+    line. With timestamp=True, column 0 is parsed as timestamp, otherwise
+    timestamps is None.
+    The pandas C parser is used if available, otherwise the lines are
+    parsed with numpy.loadtxt(). Either way, fin is read sequentially,
+    at most chunk_lines lines at a time.
+    """
+    usecols = list(usecols)
+    if pandas is not None:
+        dtype = {column: numpy.float64 for column in usecols}
+        if timestamp:
+            dtype[0] = str
+        reader = pandas.read_csv(
+            fin, header=None, comment='#', skipinitialspace=True,
+            usecols=([0] if timestamp else []) + usecols,
+            dtype=dtype, engine='c', float_precision='round_trip',
+            chunksize=chunk_lines)
+        with reader:
+            for frame in reader:
+                yield (parse_timestamps(frame[0].to_numpy())
+                       if timestamp else None,
+                       frame[usecols].to_numpy(dtype=numpy.float64))
+        return
+
+    while True:
+        lines = list(itertools.islice(fin, chunk_lines))
+        if not lines:
+            break
+        lines = [line for line in lines
+                 if line.strip() and not line.startswith('#')]
+        if not lines:
+            continue
+        yield (parse_timestamps([line.split(",", 1)[0] for line in lines])
+               if timestamp else None,
+               numpy.loadtxt(lines, delimiter=",", usecols=usecols,
+                             ndmin=2))
+
+
+def read_columns(fin, usecols, timestamp=False, chunk_lines=100000):
+    """Read the data lines of fin, return timestamps, values.
+
+    Same as iter_columns() but all chunks concatenated.
+    """
+    timestamps = []
+    values = []
+    for chunk_timestamps, chunk_values in iter_columns(
+            fin, usecols, timestamp, chunk_lines):
+        timestamps.append(chunk_timestamps)
+        values.append(chunk_values)
+    values = numpy.concatenate(values) if values \
+        else numpy.empty((0, len(list(usecols))))
+    if not timestamp:
+        return None, values
+    return (numpy.concatenate(timestamps) if timestamps
+            else numpy.empty(0, dtype='datetime64[us]')), values
+
+
+class SidBufferStore():
+    """Memory mapped file holding the buffers of one day.
+
+    Layout:
+        header of HEADER_SIZE bytes: magic, number of stations,
+            number of readings per station, log interval, UTC start time,
+            comma separated station list
+        data        float64 (stations, readings)
+        timestamps  int64 (readings), micro-seconds since the epoch (UTC),
+                    0 for no reading yet
+
+    The recording process opens it with stations, log_interval and
+    readings. Any other process may open it read only with the filename
+    alone to access the current day without a CSV file.
+    """
+
+    MAGIC = b"SIDBUF01"
+    HEADER = struct.Struct("<8sHII32s")
+    HEADER_SIZE = 512
+
+    def __init__(self, filename, stations=None, log_interval=None,
+                 readings=None):
+        self.filename = filename
+        if stations is None:
+            mode = "r"
+        else:
+            mode = "r+"
+            if not self.has_layout(self.read_header(filename), stations,
+                                   log_interval, readings):
+                self.create(filename, stations, log_interval, readings)
+        header = self.read_header(filename)
+        if header is None:
+            raise ValueError(f"{filename} is not a SidBufferStore")
+        self.stations = header['stations']
+        self.log_interval = header['log_interval']
+        self.utc_starttime = header['utc_starttime']
+        shape = (len(self.stations), header['readings'])
+        self.data = numpy.memmap(filename, dtype='<f8', mode=mode,
+                                 offset=self.HEADER_SIZE, shape=shape)
+        self.timestamps = numpy.memmap(
+            filename, dtype='<i8', mode=mode,
+            offset=self.HEADER_SIZE + self.data.nbytes,
+            shape=(header['readings'],))
+
+    @classmethod
+    def read_header(cls, filename):
+        """Return the header as dictionary, None if not a valid file."""
+        if not os.path.isfile(filename):
+            return None
+        with open(filename, "rb") as fin:
+            raw = fin.read(cls.HEADER_SIZE)
+        if len(raw) < cls.HEADER_SIZE or not raw.startswith(cls.MAGIC):
+            return None
+        _, n_stations, readings, log_interval, utc_starttime = \
+            cls.HEADER.unpack_from(raw)
+        stations = raw[cls.HEADER.size:].rstrip(b"\0").decode().split(",")
+        if (len(stations) != n_stations
+                or os.path.getsize(filename)
+                != cls.HEADER_SIZE + (n_stations + 1) * readings * 8):
+            return None
+        return {
+            'stations': stations,
+            'readings': readings,
+            'log_interval': log_interval,
+            'utc_starttime': utc_starttime.rstrip(b"\0").decode(),
+        }
+
+    @classmethod
+    def has_layout(cls, header, stations, log_interval, readings):
+        """Return True if header is of buffers of these stations, in this
+        order, log_interval and number of readings."""
+        return (header is not None
+                and header['stations'] == list(stations)
+                and header['log_interval'] == log_interval
+                and header['readings'] == readings)
+
+    @classmethod
+    def create(cls, filename, stations, log_interval, readings):
+        """Create a zero filled file."""
+        station_list = ",".join(stations).encode()
+        if cls.HEADER.size + len(station_list) > cls.HEADER_SIZE:
+            raise ValueError("too many stations for the header")
+        with open(filename, "wb") as fout:
+            fout.write(cls.HEADER.pack(cls.MAGIC, len(stations), readings,
+                                       log_interval, b""))
+            fout.write(station_list.ljust(cls.HEADER_SIZE - cls.HEADER.size,
+                                          b"\0"))
+            fout.truncate(cls.HEADER_SIZE + (len(stations) + 1) * readings * 8)
+
+    def set_utc_starttime(self, utc_starttime):
+        """Start a new day: zero the buffers, update the header."""
+        self.data.fill(0.0)
+        self.timestamps.fill(0)
+        self.utc_starttime = utc_starttime[:19]
+        with open(self.filename, "r+b") as fout:
+            fout.seek(self.HEADER.size - 32)
+            fout.write(self.utc_starttime.encode().ljust(32, b"\0"))
+
+    def flush(self):
+        self.data.flush()
+        self.timestamps.flush()
+
+
+class SidBinary():
+    """Compact binary container of a SID or SuperSID file (.sidb).
+
+    Layout:
+        HEADER      magic, version, compression, bytes per value, flags,
+                    number of stations, number of readings,
+                    start time and interval in micro-seconds,
+                    size of the header text
+        header text the '#' header lines of the CSV file, UTF-8
+        payload     timestamps int64 (readings), micro-seconds since the
+                    epoch (UTC), only if they are not regular,
+                    then data float32 or float64 (stations, readings),
+                    compressed as a whole with zlib or lzma if requested
+
+    Regular timestamps are stored as start time and interval only.
+    The float64 data and the header text reproduce the CSV file exactly.
+    """
+
+    MAGIC = b"SIDBIN01"
+    VERSION = 1
+    HEADER = struct.Struct("<8sHBBBxIIqqI")
+    COMPRESSIONS = ("none", "zlib", "lzma")
+    REGULAR = 1     # flags: timestamps are start + index * interval
+    EXTENDED = 2    # flags: the CSV timestamps are extended
+
+    @classmethod
+    def write(cls, filename, header, data, timestamps, extended,
+              compression="zlib", float32=False):
+        """Write header text, data (stations, readings) and timestamps."""
+        data = numpy.atleast_2d(numpy.asarray(
+            data, dtype='<f4' if float32 else '<f8'))
+        timestamps = to_datetime64(timestamps).view('<i8')
+        flags = cls.EXTENDED if extended else 0
+        start = int(timestamps[0]) if len(timestamps) else 0
+        interval = int(timestamps[1] - timestamps[0]) \
+            if len(timestamps) > 1 else 0
+        payload = data.tobytes()
+        if numpy.array_equal(
+                timestamps,
+                start + interval * numpy.arange(len(timestamps))):
+            flags |= cls.REGULAR
+        else:
+            payload = timestamps.tobytes() + payload
+        if compression == "zlib":
+            payload = zlib.compress(payload, 6)
+        elif compression == "lzma":
+            payload = lzma.compress(payload)
+        elif compression != "none":
+            raise ValueError(f"unknown compression {compression}")
+        header = header.encode("utf-8")
+        with atomic_write(filename, binary=True) as fout:
+            fout.write(cls.HEADER.pack(
+                cls.MAGIC, cls.VERSION, cls.COMPRESSIONS.index(compression),
+                data.itemsize, flags, data.shape[0], data.shape[1],
+                start, interval, len(header)))
+            fout.write(header)
+            fout.write(payload)
+
+    @classmethod
+    def read(cls, filename, header_only=False):
+        """Return a dictionary with header, data, timestamps and extended.
+
+        With header_only=True, data and timestamps are not read.
+        """
+        with open(filename, "rb") as fin:
+            raw = fin.read(cls.HEADER.size)
+            if not raw.startswith(cls.MAGIC) or len(raw) < cls.HEADER.size:
+                raise ValueError(f"{filename} is not a SidBinary file")
+            (_, version, compression, itemsize, flags, n_stations, readings,
+             start, interval, header_size) = cls.HEADER.unpack_from(raw)
+            if version != cls.VERSION:
+                raise ValueError(
+                    f"{filename}: unsupported version {version}")
+            header = fin.read(header_size).decode("utf-8")
+            if header_only:
+                return {'header': header,
+                        'extended': bool(flags & cls.EXTENDED)}
+            payload = fin.read()
+        if cls.COMPRESSIONS[compression] == "zlib":
+            payload = zlib.decompress(payload)
+        elif cls.COMPRESSIONS[compression] == "lzma":
+            payload = lzma.decompress(payload)
+        if flags & cls.REGULAR:
+            timestamps = start + interval * numpy.arange(readings,
+                                                         dtype='<i8')
+            offset = 0
+        else:
+            timestamps = numpy.frombuffer(payload, dtype='<i8',
+                                          count=readings)
+            offset = timestamps.nbytes
+        data = numpy.frombuffer(payload, dtype='<f%d' % itemsize,
+                                count=n_stations * readings, offset=offset)
+        return {
+            'header': header,
+            'data': data.reshape((n_stations, readings)).astype(float),
+            'timestamps': timestamps.astype('datetime64[us]'),
+            'extended': bool(flags & cls.EXTENDED),
+        }
+
+
 class SidFile():
     """Class to read SID or SuperSID files.
 
@@ -48,7 +426,9 @@ class SidFile():
 
     def __init__(self, filename="",
                  sid_params=None,
-                 force_read_timestamp=False):
+                 force_read_timestamp=False,
+                 buffers_filename=None,
+                 lazy=False):
         """Two ways to create a SIDfile object.
 
         1) A file already exists and you want to read it: use 'filename'
@@ -56,32 +436,48 @@ class SidFile():
             to indicate the parameters of the file's header.
             The dictionary retrieved from a config file can be used.
             Usually this means you need to write file after data collection.
+            With 'buffers_filename' the buffers are kept in a memory mapped
+            SidBufferStore, today's readings of an existing one are kept.
+        With 'lazy' only the header of 'filename' is read. The data is read
+        on the first access to 'data' or 'timestamp', iter_chunks() and
+        read_range() read parts of it without loading the whole file.
 
         Note: only one or the other parameter should be given.
         If both are given then 'filename' is taken and 'sid_params' is ignored.
         """
         self.version = "1.4 20150801"
         self.filename = filename
+        self.buffers_filename = buffers_filename
+        self.store = None
         if sid_params is None:
             sid_params = {}
         self.sid_params = sid_params    # dictionary of all header pairs
         self.is_extended = False
         self.timestamp_format = SidFile._TIMESTAMP_STANDARD
+        self.force_read_timestamp = force_read_timestamp
+        self.data_offset = None     # position of the first CSV data line
+        self._data = None
+        self._timestamp = None
+        self.pending = False    # lazy: data not read yet
 
         if filename:
-            # Read all lines in a buffer used by 'read_data' and 'read_header'
+            # the header is read line by line, the data lines in bulk
             try:
-                with open(self.filename, "rt", encoding="utf-8") as fin:
-                    self.lines = fin.readlines()
+                if filename.endswith(SIDB_EXTENSION):
+                    self.read_binary(header_only=lazy)
+                else:
+                    with open(self.filename, "rt", encoding="utf-8") as fin:
+                        self.read_header(fin)
+                        self.read_timestamp_format()
+                        self.control_header()
+                        self.data_offset = fin.tell()
+                        if not lazy:
+                            self.read_data(fin, force_read_timestamp)
             except IOError as why:
                 print("Error reading", filename)
                 print(str(why))
                 exit(1)
-
-            self.read_header()
-            self.read_timestamp_format()
-            self.control_header()
-            self.read_data(force_read_timestamp)
+            self.pending = lazy
 
         elif self.sid_params:
             # create zeroes numpy arrays to receive data
@@ -91,11 +487,99 @@ class SidFile():
     # Read a SID File and control header's consistency
     #
 
+    @property
+    def data(self):
+        """Station data (stations, readings), read now if lazy."""
+        if self.pending:
+            self.load()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    @property
+    def timestamp(self):
+        """Timestamps as numpy.datetime64[us], read now if lazy."""
+        if self.pending:
+            self.load()
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, timestamp):
+        self._timestamp = timestamp
+
+    def load(self):
+        """Read the data of a lazily opened file."""
+        self.pending = False
+        if self.filename.endswith(SIDB_EXTENSION):
+            self.read_binary()
+            return
+        with open(self.filename, "rt", encoding="utf-8") as fin:
+            fin.seek(self.data_offset)
+            self.read_data(fin, self.force_read_timestamp)
+
+    def iter_chunks(self, rows=CHUNK_ROWS):
+        """Yield timestamps, data (stations, rows) of up to rows readings.
+
+        A lazily opened CSV file is read chunk by chunk and not kept.
+        """
+        if not self.pending or self.filename.endswith(SIDB_EXTENSION):
+            for start in range(0, len(self.timestamp), rows):
+                yield (self.timestamp[start:start + rows],
+                       self.data[:, start:start + rows])
+            return
+        interval = numpy.timedelta64(round(self.LogInterval * 1000000), 'us')
+        with open(self.filename, "rt", encoding="utf-8") as fin:
+            fin.seek(self.data_offset)
+            if self.isSuperSID:
+                usecols = range(int(self.is_extended),
+                                len(self.stations) + int(self.is_extended))
+            else:
+                usecols = (1,)
+            # classic SuperSID files have no timestamp column
+            read_timestamps = self.is_extended or not self.isSuperSID
+            start = 0
+            for timestamps, values in iter_columns(
+                    fin, usecols, read_timestamps, rows):
+                if not read_timestamps:
+                    timestamps = to_datetime64(self.startTime) \
+                        + numpy.arange(start, start + len(values)) * interval
+                start += len(values)
+                yield timestamps, values.transpose()
+
+    def read_range(self, start, end):
+        """Return timestamps, data of the readings from start to before end.
+
+        start and end may be datetime or numpy.datetime64. The timestamps
+        are assumed in ascending order, reading stops after end.
+        """
+        start, end = to_datetime64(start), to_datetime64(end)
+        timestamps = [numpy.empty(0, dtype='datetime64[us]')]
+        data = [numpy.empty((len(self.stations), 0))]
+        for chunk_timestamps, chunk_data in self.iter_chunks():
+            if len(chunk_timestamps) and chunk_timestamps[0] >= end:
+                break
+            selected = (chunk_timestamps >= start) & (chunk_timestamps < end)
+            timestamps.append(chunk_timestamps[selected])
+            data.append(chunk_data[:, selected])
+        return numpy.concatenate(timestamps), numpy.concatenate(data, axis=1)
+
     def clear_buffer(self, next_day=False):
         """Create zero numpy arrays to receive data and generates timestamp."""
         if next_day:
             self.data.fill(0.0)
             self.set_all_date_attributes()
+            if self.store is not None:
+                self.store.set_utc_starttime(self.UTC_StartTime)
+        elif self.buffers_filename:
+            nb_data_per_day = int((24 * 3600) / self.LogInterval)
+            self.store = SidBufferStore(self.buffers_filename, self.stations,
+                                        self.LogInterval, nb_data_per_day)
+            if self.store.utc_starttime[:10] != self.UTC_StartTime[:10]:
+                # not today's readings
+                self.store.set_utc_starttime(self.UTC_StartTime)
+            self.data = self.store.data
         else:
             # Number of samples in a day is seconds in a day divided by log interval
             nb_data_per_day = int((24 * 3600) / self.LogInterval)
@@ -103,6 +587,41 @@ class SidFile():
         # create an array containing the timestamps for each data reading
         # default initialization
         self.generate_timestamp()
+        if self.store is not None:
+            # the timestamps of the readings kept in the store
+            recorded = numpy.flatnonzero(self.store.timestamps)
+            self.timestamp[recorded] = \
+                self.store.timestamps[recorded].view('datetime64[us]')
+
+    def set_timestamp(self, index, timestamp):
+        """Set the timestamp of the reading(s) at index.
+
+        timestamp may be a datetime, a numpy.datetime64 or an array of them.
+        """
+        self.timestamp[index] = to_datetime64(timestamp)
+        if self.store is not None:
+            self.store.timestamps[index] = \
+                self.timestamp[index].view('<i8')
+
+    @property
+    def datetimes(self):
+        """Return the timestamps as array of naive UTC datetime objects.
+
+        For code which needs datetime methods, self.timestamp is a
+        numpy.datetime64[us] array.
+        """
+        return self.timestamp.astype(object)
+
+    @classmethod
+    def format_timestamps(cls, timestamps, extended):
+        """Return the timestamps as strings, vectorized strftime().
+
+        "%Y-%m-%d %H:%M:%S.%f" if extended else "%Y-%m-%d %H:%M:%S"
+        """
+        return numpy.char.replace(
+            numpy.datetime_as_string(timestamps,
+                                     unit='us' if extended else 's'),
+            'T', ' ')
 
     def control_header(self):
         """Perform sanity check and assign standard attributes.
@@ -151,15 +670,23 @@ class SidFile():
         self.startTime = SidFile._StringToDatetime(
             self.sid_params["utc_starttime"])
 
-    def read_header(self):
+    def read_header(self, fin):
         """Reads the first lines of a SID file to extract the 'sid_params'.
 
-        No more file access: all in memory using 'self.lines'
+        fin is left at the first data line, which is kept as
+        'self.first_data_line'.
         """
         self.sid_params.clear()
         self.headerNbLines = 0  # number of header lines
-        for line in self.lines:
+        self.first_data_line = ""
+        while True:
+            position = fin.tell()
+            line = fin.readline()
+            if not line:
+                break   # no data
             if line[0] != "#":
+                self.first_data_line = line
+                fin.seek(position)
                 break   # end of header
             self.headerNbLines += 1
             tokens = line.split("=")
@@ -174,7 +701,7 @@ class SidFile():
 
     def read_timestamp_format(self):
         """Check the timestamp on the first line to deduce the format"""
-        first_data_line = self.lines[self.headerNbLines].split(",")
+        first_data_line = self.first_data_line.split(",")
         if ':' in first_data_line[0]:  # time stamp is found in first column
             try:
                 datetime.strptime(first_data_line[0],
@@ -189,30 +716,24 @@ class SidFile():
                 SidFile._timestamp_format = SidFile._TIMESTAMP_STANDARD
                 self.timestamp_format = SidFile._TIMESTAMP_STANDARD
 
-    def read_data(self, force_read_timestamp=False):
-        """Using the self.lines buffer, converts data lines in numpy arrays.
+    def read_data(self, fin, force_read_timestamp=False):
+        """Reads the data lines of fin in numpy arrays.
 
             - One array self.data for the data (one column/vector per station)
             - One array self.timestamp for timestamps (i.e. timestamp vector)
         Reading method differs accordingly to the self.isSuperSID flag
         New: Extended format supports a timestamp for SuperSID format as well
         as .%f for second decimals
+        fin must be positioned at the first data line, see read_header().
         """
-        # necessary to convert timestamp string (extended or not) to datetime
-        # AND decode byte array to string to float
-        converters_dict = {0: SidFile._StringToDatetime}
-        for i in range(len(self.stations)):
-            converters_dict[i+1] = SidFile._StringToFloat
-
         if self.isSuperSID and not self.is_extended:
             # classic SuperSID file format: one data column per station,
             # no time stamp (has to be generated)
             print(
                 "Warning: read SuperSid non extended file and generate time "
                 "stamps.")
-            self.data = numpy.loadtxt(self.lines,
-                                      comments='#',
-                                      delimiter=",").transpose()
+            _, values = read_columns(fin, range(len(self.stations)))
+            self.data = values.transpose()
             self.generate_timestamp()
         elif self.isSuperSID and self.is_extended:
             # extended SuperSID file format: one extended time stamp then
@@ -220,41 +741,61 @@ class SidFile():
             print(
                 "Warning: read SuperSid extended file, time stamps are read & "
                 "converted from file.")
-            inData = numpy.loadtxt(self.lines, dtype=datetime, comments='#',
-                                   delimiter=",", converters=converters_dict)
-            self.timestamp = inData[:, 0]  # column 0
-            self.data = numpy.array(inData[:, 1:], dtype=float).transpose()
+            self.timestamp, values = read_columns(
+                fin, range(1, len(self.stations) + 1), timestamp=True)
+            self.data = values.transpose()
         else:
             # classic SID file format:
             # two columns file: [timestamp, data]
-            # Try to avoid reading timestamps:
-            #   date str to num conversion takes time
+            # Try to avoid converting timestamps when a full day is read:
+            #   they can be generated from the log interval
             # self.data must still be a 2 dimensions numpy.array
             #   even so only one vector is contained
-            if (((len(self.lines) - self.headerNbLines)
-                != ((60 * 60 * 24) / self.LogInterval))
-                    or force_read_timestamp
-                    or self.is_extended):
+            timestamps = None
+            if force_read_timestamp or self.is_extended:
+                timestamps, values = read_columns(fin, (1,), timestamp=True)
+            else:
+                start = fin.tell()
+                _, values = read_columns(fin, (1,))
+                if len(values) != ((60 * 60 * 24) / self.LogInterval):
+                    # not a full day: read again with the timestamps
+                    fin.seek(start)
+                    timestamps, values = read_columns(fin, (1,),
+                                                      timestamp=True)
+            self.data = values.transpose()
+            if timestamps is not None:
                 print(
                     "Warning: read SID file, timestamps are read & converted "
                     "from file.")
-                inData = numpy.loadtxt(self.lines, dtype=datetime,
-                                       comments='#', delimiter=",",
-                                       converters=converters_dict)
-                self.timestamp = inData[:, 0]  # column 0
-                self.data = numpy.array(inData[:, 1],
-                                        dtype=float, ndmin=2)  # column 1
+                self.timestamp = timestamps
             else:
                 print(
                     "Optimization: read SID file, generate timestamp instead "
                     "of reading & converting them from file.")
-                self.data = numpy.array(numpy.loadtxt(self.lines, comments='#',
-                                                      delimiter=",",
-                                                      usecols=(1,)),
-                                        ndmin=2)  # only read data column
                 self.generate_timestamp()
         # print("self.data.shape =", self.data.shape)
 
+    def read_binary(self, header_only=False):
+        """Read a SidBinary file: header, timestamps and data."""
+        content = SidBinary.read(self.filename, header_only)
+        self.read_header(io.StringIO(content['header']))
+        self.is_extended = content['extended']
+        self.timestamp_format = SidFile._TIMESTAMP_EXTENDED \
+            if self.is_extended else SidFile._TIMESTAMP_STANDARD
+        SidFile._timestamp_format = self.timestamp_format
+        self.control_header()
+        if not header_only:
+            self.timestamp = content['timestamps']
+            self.data = content['data']
+
+    def write_binary(self, filename, data, isSuperSid, log_type, extended,
+                     compression="zlib", float32=False):
+        """Write data with the SID or SuperSID header as SidBinary file."""
+        SidBinary.write(filename,
+                        self.create_header(isSuperSid, log_type),
+                        data, self.timestamp, extended,
+                        compression=compression, float32=float32)
+
     @classmethod
     def _StringToDatetime(cls, strTimestamp):
         if type(strTimestamp) is not str:  # i.e. byte array
@@ -284,17 +825,16 @@ class SidFile():
         if 1 == len(self.data.shape):
             # self.data is one dimensional
             # if one station is configured
-            self.timestamp = numpy.empty(len(self.data), dtype=datetime)
+            nb_timestamps = len(self.data)
         elif 2 == len(self.data.shape):
             # self.data is two dimensional
             # if more than one station is configured
-            self.timestamp = numpy.empty(len(self.data[0]), dtype=datetime)
+            nb_timestamps = len(self.data[0])
         # add 'interval' seconds to UTC_StartTime for each entries
-        interval = timedelta(seconds=self.LogInterval)
-        currentTimestamp = self.startTime
-        for i in range(len(self.timestamp)):
-            self.timestamp[i] = currentTimestamp
-            currentTimestamp += interval
+        interval = numpy.timedelta64(
+            round(self.LogInterval * 1000000), 'us')
+        self.timestamp = to_datetime64(self.startTime) \
+            + numpy.arange(nb_timestamps) * interval
 
     #########################
     # Facilitator functions #
@@ -373,7 +913,22 @@ class SidFile():
                 # missing station in the second file
                 pass
         if has_copied:
-            self.timestamp = second_sidfile.timestamp[:]  # deep copy
+            self.timestamp = second_sidfile.timestamp.copy()  # deep copy
+            if self.store is not None:
+                self.store.timestamps[:] = self.timestamp.view('<i8')
+
+    def snapshot(self):
+        """Return a copy which is not affected by later recordings.
+
+        Only the buffers and the header parameters are copied, which is
+        fast enough to be done between two readings.
+        """
+        sid_file = copy.copy(self)
+        sid_file.sid_params = dict(self.sid_params)
+        sid_file.data = numpy.array(self.data)
+        sid_file.timestamp = self.timestamp.copy()
+        sid_file.store = None
+        return sid_file
 
     #
     #  Write a SID File
@@ -424,13 +979,16 @@ class SidFile():
         return hdr
 
     def write_data_sid(self, station, filename, log_type, apply_bema=True,
-                       extended=False, bema_wing=6):
+                       extended=False, bema_wing=6, compression="zlib",
+                       float32=False):
         """Write in the file 'filename' the dataset of the given station.
 
         Write using the SID format
             i.e. "TimeStamp, Data" lines
         Header respects the SID format definition
             i.e. conversion if self is SuperSid
+        A filename ending with SIDB_EXTENSION is written as SidBinary file
+        with the given compression, float32 or float64 values.
         """
         iStation = self.get_station_index(station)
         #  if the exiting file is SuperSID
@@ -446,52 +1004,48 @@ class SidFile():
             tmp_data = SidFile.filter_buffer(self.data[iStation],
                                              self.LogInterval,
                                              bema_wing=bema_wing)
+        if filename.endswith(SIDB_EXTENSION):
+            self.write_binary(filename, tmp_data, False, log_type, extended,
+                              compression, float32)
+            return
         # write file in SID format
-        with open(filename, "wt") as fout:
+        with atomic_write(filename) as fout:
             # generate header
             hdr = self.create_header(isSuperSid=False, log_type=log_type)
             print(hdr, file=fout, end="")
             # generate the "timestamp, data" serie i.e. data lines
             # "%Y-%m-%d %H:%M:%S.%f" if extended else "%Y-%m-%d %H:%M:%S"
-            timestamp_format = SidFile._TIMESTAMP_EXTENDED \
-                if extended \
-                else SidFile._TIMESTAMP_STANDARD
-            for t_stamp, x in zip(self.timestamp, tmp_data):
-                print("%s, %.15f" % (t_stamp.strftime(timestamp_format), x),
-                      file=fout)
+            write_rows(fout, tmp_data,
+                       self.format_timestamps(self.timestamp, extended))
 
     def write_data_supersid(self, filename, log_type, apply_bema=True,
-                            extended=False, bema_wing=6):
+                            extended=False, bema_wing=6, compression="zlib",
+                            float32=False):
         """Write the SuperSID file.
 
         Attention: self.sid_params must contain all expected entries.
+        A filename ending with SIDB_EXTENSION is written as SidBinary file
+        with the given compression, float32 or float64 values.
         """
+        # intermediate buffer to have 'raw' or 'filtered' data
+        if log_type == RAW or not apply_bema:
+            tmp_data = self.data
+        else:  # filtered
+            tmp_data = SidFile.filter_buffer(self.data, self.LogInterval,
+                                             bema_wing=bema_wing)
+        # print(tmp_data.shape) should be like (2, 17280)
+        if filename.endswith(SIDB_EXTENSION):
+            self.write_binary(filename, tmp_data, True, log_type, extended,
+                              compression, float32)
+            return
         # force to SuperSid format
         hdr = self.create_header(isSuperSid=True, log_type=log_type)
         # create file and write header
-        with open(filename, "wt") as fout:
+        with atomic_write(filename) as fout:
             print(hdr, file=fout, end="")
-            # intermediate buffer to have 'raw' or 'filtered' data
-            if log_type == RAW or not apply_bema:
-                tmp_data = self.data
-            else:  # filtered
-                tmp_data = []
-                for stationData in self.data:
-                    tmp_data.append(SidFile.filter_buffer(stationData,
-                                                          self.LogInterval,
-                                                          bema_wing=bema_wing))
-                tmp_data = numpy.array(tmp_data)
-            # print(tmp_data.shape) should be like (2, 17280)
-            if extended:
-                for t_stamp, row in zip(self.timestamp,
-                                        numpy.transpose(tmp_data)):
-                    floats_as_strings = ["%.15f" % x for x in row]
-                    print(t_stamp.strftime(SidFile._TIMESTAMP_EXTENDED+","),
-                          ", ".join(floats_as_strings), file=fout)
-            else:
-                for row in numpy.transpose(tmp_data):
-                    floats_as_strings = ["%.15f" % x for x in row]
-                    print(", ".join(floats_as_strings), file=fout)
+            write_rows(fout, tmp_data,
+                       self.format_timestamps(self.timestamp, True)
+                       if extended else None)
 
         # append data to file using numpy function (symmetric to loadtxt)
         # future: version 1.7 offers "header=hdr" as new function param
@@ -509,43 +1063,55 @@ class SidFile():
         data points within a range (bema_window)
         bema_wing = 6 => window = 13
         (bema_wing + evaluating point + bema_wing)
+        raw_buffer may be one station or (stations, readings), each row is
+        filtered.
         """
-        length = len(raw_buffer)
-        # Extend 2 wings to  raw data buffer before taking min and average
-        dstack = numpy.hstack((raw_buffer[length-bema_wing:length],
-                               raw_buffer[0:length],
-                               raw_buffer[0:bema_wing]))
-        # Fill the 2 wings with the values at the edge
-
-        # dstack[bema_wing]
-        dstack[0:bema_wing] = raw_buffer[0]
-
-        # dstack[length+bema_wing-1]
-        dstack[length+bema_wing:length+bema_wing*2] = raw_buffer[-1]
-
-        # Use the lowest point found in window to represent its value
-        dmin = numpy.zeros(len(dstack))
-        for i in range(bema_wing, length+bema_wing):
-            dmin[i] = min(dstack[i-bema_wing:i+bema_wing])
+        raw_buffer = numpy.asarray(raw_buffer, dtype=float)
+        length = raw_buffer.shape[-1]
+        window = bema_wing * 2
+        # Extend 2 wings filled with the values at the edge
+        dstack = numpy.concatenate(
+            (numpy.repeat(raw_buffer[..., :1], bema_wing, axis=-1),
+             raw_buffer,
+             numpy.repeat(raw_buffer[..., -1:], bema_wing, axis=-1)),
+            axis=-1)
+
+        # Use the lowest point found in window to represent its value:
+        # the minimum of dstack[i:i+window] for each i in range(length),
+        # van Herk/Gil-Werman: the window spans at most two blocks of
+        # 'window' values, its minimum is the minimum of the suffix of the
+        # first block and the prefix of the second one. O(n) for any window.
+        n_blocks = -(-(length + window) // window)
+        padded = numpy.full(dstack.shape[:-1] + (n_blocks * window,),
+                            numpy.inf)
+        padded[..., :dstack.shape[-1]] = dstack
+        blocks = padded.reshape(dstack.shape[:-1] + (n_blocks, window))
+        prefix = numpy.minimum.accumulate(blocks, axis=-1) \
+            .reshape(padded.shape)
+        suffix = numpy.minimum.accumulate(blocks[..., ::-1], axis=-1) \
+            [..., ::-1].reshape(padded.shape)
+        dmin = numpy.empty(dstack.shape)
+        dmin[..., bema_wing:length+bema_wing] = numpy.minimum(
+            suffix[..., :length], prefix[..., window-1:length+window-1])
         # The points beyond the left edge, set to the starting point value
-        dmin[0:bema_wing] = dmin[bema_wing]
+        dmin[..., 0:bema_wing] = dmin[..., bema_wing:bema_wing+1]
         # The points beyond the right edge, set to the ending point value
-        dmin[length+bema_wing:length+bema_wing*2] = dmin[length+bema_wing-1]
+        dmin[..., length+bema_wing:length+bema_wing*2] = \
+            dmin[..., length+bema_wing-1:length+bema_wing]
         # Moving Average. This actually truncates array to original size
 
         def movavg(a, n):
-            ret = numpy.cumsum(a, dtype=float)
-            ret[n:] = ret[n:] - ret[:-n]
-            return ret[n - 1:] / n
+            ret = numpy.cumsum(a, axis=-1, dtype=float)
+            ret[..., n:] = ret[..., n:] - ret[..., :-n]
+            return ret[..., n - 1:] / n
         daverage = movavg(dmin, (bema_wing*2+1))
 
         if gmt_offset == 0:
             return daverage
         else:
-            gmt_mark = gmt_offset * (60/data_interval) * 60
-            doffset = numpy.hstack((daverage[gmt_mark:length],
-                                    daverage[0:gmt_mark]))
-            return doffset
+            # shift by whole readings, the offset may be fractional hours
+            gmt_mark = int(round(gmt_offset * 60 * 60 / data_interval))
+            return numpy.roll(daverage, -gmt_mark, axis=-1)
 
 
 # -------------------------------------------------------------------------------
@@ -554,6 +1120,7 @@ class SidFile():
 #
 if __name__ == '__main__':
     from os import path
+    import sys
     import argparse
 
     # /original/path/name.merge.ext
@@ -597,9 +1164,164 @@ if __name__ == '__main__':
         default=6,
         help="Width of the window used in filtering a.k.a. 'bema_wing' "
         "(default=6)")
+    parser.add_argument(
+        "-c", "--convert",
+        dest="filename_convert",
+        required=False,
+        type=exist_file,
+        nargs="*",
+        help="Convert CSV files to binary %s files and vice versa"
+        % SIDB_EXTENSION)
+    parser.add_argument(
+        "--compression",
+        dest="compression",
+        required=False,
+        choices=SidBinary.COMPRESSIONS,
+        default="zlib",
+        help="Compression of the binary files (default=zlib)")
+    parser.add_argument(
+        "--float32",
+        dest="float32",
+        action="store_true",
+        help="Store float32 instead of float64 values in the binary files, "
+        "half the size but no longer lossless")
+    parser.add_argument(
+        "--benchmark",
+        dest="benchmark",
+        required=False,
+        type=int,
+        nargs="*",
+        help="Compare the reader with numpy.loadtxt() and filter_buffer() "
+        "with the per sample loop on generated files, optionally for the "
+        "given log intervals (default=1 5)")
     args = parser.parse_args()
-    if args.filename_info:
-        sid = SidFile(args.filename_info, force_read_timestamp=True)
+    if args.benchmark is not None:
+        import io
+        import time
+        import tempfile
+        from contextlib import redirect_stdout
+
+        def read_loadtxt(filename, n_stations):
+            # the reader before the streaming one, as reference
+            with open(filename, "rt", encoding="utf-8") as fin:
+                lines = fin.readlines()
+            converters_dict = {0: SidFile._StringToDatetime}
+            for i in range(n_stations):
+                converters_dict[i+1] = SidFile._StringToFloat
+            inData = numpy.loadtxt(lines, dtype=datetime, comments='#',
+                                   delimiter=",", converters=converters_dict)
+            return (to_datetime64(inData[:, 0]),
+                    numpy.array(inData[:, 1:], dtype=float).transpose())
+
+        def filter_loop(raw_buffer, bema_wing):
+            # the filter before the O(n) one, as reference
+            length = len(raw_buffer)
+            dstack = numpy.hstack((raw_buffer[length-bema_wing:length],
+                                   raw_buffer[0:length],
+                                   raw_buffer[0:bema_wing]))
+            dstack[0:bema_wing] = raw_buffer[0]
+            dstack[length+bema_wing:length+bema_wing*2] = raw_buffer[-1]
+            dmin = numpy.zeros(len(dstack))
+            for i in range(bema_wing, length+bema_wing):
+                dmin[i] = min(dstack[i-bema_wing:i+bema_wing])
+            dmin[0:bema_wing] = dmin[bema_wing]
+            dmin[length+bema_wing:length+bema_wing*2] = \
+                dmin[length+bema_wing-1]
+            ret = numpy.cumsum(dmin, dtype=float)
+            n = bema_wing*2+1
+            ret[n:] = ret[n:] - ret[:-n]
+            return ret[n - 1:] / n
+
+        def best_of(function, repeat=3):
+            t_best = float('inf')
+            for _ in range(repeat):
+                t_start = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    result = function()
+                t_best = min(t_best, time.perf_counter() - t_start)
+            return t_best, result
+
+        stations = ["NAA", "NLK", "DHO", "GQD"]
+        identical = True
+        with tempfile.TemporaryDirectory() as directory:
+            for log_interval in args.benchmark or [1, 5]:
+                sid = SidFile(sid_params={
+                    'site_name': "BENCH", 'contact': "bench",
+                    'longitude': "0", 'latitude': "0", 'utc_offset': "0",
+                    'time_zone': "UTC", 'monitor_id': "1",
+                    'log_interval': str(log_interval),
+                    'utc_starttime': "2026-01-01 00:00:00",
+                    'stations': ",".join(stations),
+                    'frequencies': "24000,24800,23400,22100"})
+                sid.data[:] = numpy.random.default_rng(0).uniform(
+                    0, 1000, sid.data.shape)
+                sid.timestamp += numpy.random.default_rng(1).integers(
+                    0, 1000000, len(sid.timestamp)) \
+                    .astype('timedelta64[us]')
+                files = (
+                    ("supersid_extended", len(stations),
+                     path.join(directory, "supersid.csv")),
+                    ("sid_extended", 1, path.join(directory, "sid.csv")))
+                sid.write_data_supersid(files[0][2], RAW, extended=True)
+                sid.write_data_sid(stations[0], files[1][2], RAW,
+                                   extended=True)
+                for bema_wing in (1, 6, 60):
+                    t_loop, reference = best_of(lambda: numpy.array(
+                        [filter_loop(station_data, bema_wing)
+                         for station_data in sid.data]), repeat=1)
+                    t_filter, filtered = best_of(
+                        lambda: SidFile.filter_buffer(
+                            sid.data, log_interval, bema_wing=bema_wing))
+                    equal = numpy.array_equal(filtered, reference)
+                    identical = identical and equal
+                    print("filter_buffer     {}s, {:2d} wing x {}: loop "
+                          "{:7.1f} ms, O(n) {:6.1f} ms, speedup {:5.0f}x, "
+                          "identical {}"
+                          .format(log_interval, bema_wing, len(stations),
+                                  t_loop * 1000, t_filter * 1000,
+                                  t_loop / t_filter, equal))
+                for name, n_stations, filename in files:
+                    t_loadtxt, (timestamps, data) = best_of(
+                        lambda: read_loadtxt(filename, n_stations))
+                    readers = {}
+                    if pandas is not None:
+                        readers["pandas"] = best_of(lambda: SidFile(filename))
+                    # same reader without pandas, i.e. numpy.loadtxt() chunks
+                    pandas, saved_pandas = None, pandas
+                    readers["numpy"] = best_of(lambda: SidFile(filename))
+                    pandas = saved_pandas
+                    for parser_name, (t_read, new) in readers.items():
+                        equal = (numpy.array_equal(new.timestamp, timestamps)
+                                 and numpy.array_equal(new.data, data))
+                        identical = identical and equal
+                        print("{:17s} {}s, {:6d} lines: loadtxt {:7.1f} ms, "
+                              "{:6s} {:6.1f} ms, speedup {:5.1f}x, "
+                              "identical {}"
+                              .format(name, log_interval, len(timestamps),
+                                      t_loadtxt * 1000, parser_name,
+                                      t_read * 1000, t_loadtxt / t_read,
+                                      equal))
+        sys.exit(0 if identical else 1)
+    elif args.filename_info:
+        sid = SidFile(args.filename_info, force_read_timestamp=True,
+                      lazy=True)
+        # count the readings and keep 5 records from the first non zero one
+        # without loading the whole file
+        nb_timestamps = 0
+        records = []
+        head = []   # first 5 records in case all are zero
+        for timestamps, data in sid.iter_chunks():
+            if not nb_timestamps:
+                head = list(zip(timestamps[:5], numpy.transpose(data)[:5]))
+            nb_timestamps += len(timestamps)
+            if len(records) < 5:
+                non_zero = numpy.flatnonzero(data[0])
+                first = 0 if records else \
+                    (non_zero[0] if len(non_zero) else len(timestamps))
+                records += itertools.islice(
+                    zip(timestamps[first:], numpy.transpose(data)[first:]),
+                    5 - len(records))
+        records = records or head
         print("-" * 5, "Header information", "-" * 5)
         if sid.is_extended:
             print("Time stamps are extended.")
@@ -610,24 +1332,42 @@ if __name__ == '__main__':
             print("SID File Format")
             print("Station:", sid.stations)
         print("Start Time:", sid.startTime)
-        print("Number of TimeStamps:", len(sid.timestamp))
+        print("Number of TimeStamps:", nb_timestamps)
         # try to print 5 non zero records if found:
-        print("-" * 5, "Dataset shape:", sid.data.shape, "-" * 5)
-        for i in range(len(sid.timestamp)):
-            if sid.data[0][i] != 0.0:
-                break
-        if i == len(sid.timestamp):
-            i = 0
-        for t_stamp, row in zip(sid.timestamp[i:i+5],
-                                numpy.transpose(sid.data)[i:i+5]):
+        print("-" * 5, "Dataset shape:", (len(sid.stations), nb_timestamps),
+              "-" * 5)
+        for t_stamp, (_, row) in zip(
+                SidFile.format_timestamps(
+                    numpy.array([timestamp for timestamp, _ in records]),
+                    sid.timestamp_format == SidFile._TIMESTAMP_EXTENDED),
+                records):
             floats_as_strings = ["%.15f" % x for x in row]
-            print(t_stamp.strftime(sid.timestamp_format+","),
-                  ", ".join(floats_as_strings))
+            print(t_stamp + ",", ", ".join(floats_as_strings))
         # print the whole dictionary
         print("-" * 5, "sid_params", "-" * 5)
         for key, value in sid.sid_params.items():
             print(" " * 5, key, "=", value)
     # Some 'real' manipulations:
+    elif args.filename_convert:
+        # CSV -> binary or binary -> CSV, same header, timestamps and data
+        for filename in args.filename_convert:
+            sid = SidFile(filename, force_read_timestamp=True)
+            root, extension = path.splitext(filename)
+            fname = root + (".csv" if extension == SIDB_EXTENSION
+                            else SIDB_EXTENSION)
+            if sid.isSuperSID:
+                sid.write_data_supersid(fname, sid.sid_params['logtype'],
+                                        apply_bema=False,
+                                        extended=sid.is_extended,
+                                        compression=args.compression,
+                                        float32=args.float32)
+            else:
+                sid.write_data_sid(sid.stations[0], fname,
+                                   sid.sid_params['logtype'],
+                                   apply_bema=False, extended=sid.is_extended,
+                                   compression=args.compression,
+                                   float32=args.float32)
+            print(fname, "created.")
     elif args.filename_split:
         # Explode this SuperSID file in one file per station in SID format
         sid = SidFile(args.filename_split, force_read_timestamp=True)
@@ -3,20 +3,153 @@
 
 Define a timer with autocorrection to ensure that data acquisition is done
 on the 'interval' and as accurately as possible.
-The autocorrection compensates for the micro-seconds lost from one tick
-    to the next.
+One scheduler thread lives as long as the timer. It sleeps until the
+    absolute deadlines start_time + n * interval of the wall clock,
+    hence the micro-seconds lost from one tick to the next do not add up.
+Deadlines missed because the callback took too long are reported and
+    skipped, the timer continues on the next deadline in the future.
+TimingStats collects log-binned histograms of the tick lateness, the
+    callback duration and the durations the callback reports itself
+    (capture, psd, viewer). The percentiles allow to compare hardware and
+    settings across monitors.
 Implementation examples are provided at the source's end,
     which can be used to test the module/class.
 """
 import time
+import math
+import json
+import bisect
 from datetime import datetime, timezone
 import threading
 
 
+class TimingHistogram:
+    """Histogram of durations in seconds with logarithmic bins."""
+
+    # 10 bins per decade from 10 µs to 100 s,
+    # the first bin counts shorter and the last bin longer durations
+    BIN_EDGES = [10 ** (exponent / 10) for exponent in range(-50, 21)]
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = [0] * (len(self.BIN_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_right(self.BIN_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Return the upper bin edge below which percent of the values are."""
+        if not self.count:
+            return None
+        threshold = self.count * percent / 100
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            cumulated += count
+            if cumulated >= threshold:
+                break
+        if index == len(self.BIN_EDGES):
+            return self.max
+        return min(self.BIN_EDGES[index], self.max)
+
+    def summary(self, percents):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'max': self.max,
+            **{f"p{percent}": self.percentile(percent)
+               for percent in percents},
+        }
+
+
+class TimingStats:
+    """Timing histograms of the last hour and of the day per measurement."""
+
+    PERCENTS = (50, 90, 99)
+
+    def __init__(self):
+        self.settings = {}  # what the timings depend on, saved with them
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Start the statistics of a new day."""
+        self.hour = {}
+        self.day = {}
+        self.hourly = []    # [(utc time, {name: summary})]
+
+    def record(self, name, seconds):
+        """Add one measurement, None is ignored."""
+        if seconds is None:
+            return
+        with self.lock:
+            if name not in self.day:
+                self.hour[name] = TimingHistogram()
+                self.day[name] = TimingHistogram()
+            self.hour[name].add(seconds)
+            self.day[name].add(seconds)
+
+    def report_hour(self, utc_now):
+        """Return the percentiles of the last hour and restart the hour."""
+        with self.lock:
+            summaries = {name: histogram.summary(self.PERCENTS)
+                         for name, histogram in self.hour.items()
+                         if histogram.count}
+            for histogram in self.hour.values():
+                histogram.clear()
+        self.hourly.append((str(utc_now), summaries))
+        lines = []
+        for name, summary in summaries.items():
+            lines.append(f"{name:9s} " + " ".join(
+                f"{key}={summary[key] * 1000:.1f}ms"
+                for key in [f"p{percent}" for percent in self.PERCENTS]
+                + ['max']))
+        return "\n".join(lines)
+
+    def summary(self):
+        with self.lock:
+            return {
+                'settings': self.settings,
+                'bin_edges': TimingHistogram.BIN_EDGES,
+                'day': {name: dict(histogram.summary(self.PERCENTS),
+                                   counts=histogram.counts)
+                        for name, histogram in self.day.items()},
+                'hourly': self.hourly,
+            }
+
+    def save(self, filename):
+        with open(filename, "wt", encoding="utf-8") as fout:
+            json.dump(self.summary(), fout, indent=1)
+
+    def load(self, filename):
+        """Continue with the histograms saved earlier today."""
+        with open(filename, "rt", encoding="utf-8") as fin:
+            summary = json.load(fin)
+        if summary['bin_edges'] != TimingHistogram.BIN_EDGES:
+            return
+        with self.lock:
+            for name, saved in summary['day'].items():
+                histogram = TimingHistogram()
+                histogram.counts = saved['counts']
+                histogram.count = saved['count']
+                histogram.total = (saved['mean'] or 0.0) * saved['count']
+                histogram.max = saved['max']
+                self.day[name] = histogram
+                self.hour[name] = TimingHistogram()
+            self.hourly = [tuple(hour) for hour in summary['hourly']]
+
+
 class SidTimer:
     """Keep track of time."""
 
-    def __init__(self, interval, callback):
+    def __init__(self, interval, callback, record_timing=True):
         """Synchronize the timer and start the trigger mechanism.
 
         Public properties:
@@ -25,72 +158,100 @@ class SidTimer:
         - expected_time: theoretical time the trigger should happen
             as 'start_time synchronized to a multiple of interval'
         - time_now: real time.time() when the trigger happened
+        - missed_ticks: number of deadlines skipped since the start
+        - lateness: seconds the current trigger happened after its
+            deadline
+        - timing: TimingStats with 'lateness' and 'callback' durations,
+            the callback may add its own measurements. With record_timing
+            False the timer records nothing, the callback records the
+            lateness itself.
         """
-        self.version = "1.3.1 20130907"
+        self.version = "1.4.0 20261017"
         self.callback = callback
         self.interval = interval
         self.lock = threading.Lock()
+        self._stop_event = threading.Event()
 
         self.time_now = time.time()
-        self.utc_now = datetime.now(timezone.utc)
+        self.utc_now = datetime.fromtimestamp(self.time_now, timezone.utc)
         self.data_index = 0
-
-        # wait for synchro on the next 'interval' sec
-        now = time.gmtime()
-        while now.tm_sec % self.interval != 0:
-            time.sleep(0.05)
-            now = time.gmtime()
-        #  request a Timer
-        self.start_time = int(time.time() / self.interval) \
+        self.missed_ticks = 0
+        self.lateness = 0.0
+        self.record_timing = record_timing
+        self.timing = TimingStats()
+
+        # synchro on the next 'interval' sec,
+        # the first trigger happens one interval later
+        self.start_time = math.ceil(self.time_now / self.interval) \
             * self.interval
         self.expected_time = self.start_time + self.interval
-        self._timer = threading.Timer(self.expected_time - time.time(),
-                                      self._ontimer)
-        self._timer.start()
+        self._thread = threading.Thread(target=self._run, name="SidTimer",
+                                        daemon=True)
+        self._thread.start()
 
-    def _ontimer(self):
-        """Retrigger a timer for the next INTERVAL.
+    def _wait_for_deadline(self):
+        """Sleep until expected_time, return False if stopped meanwhile.
 
-        with adjustment if necessary
-        i.e. running late/fast then perform callback
+        The sleep is recomputed from the wall clock after each wakeup,
+        an early wakeup results in another sleep and not in busy waiting.
+        """
+        while True:
+            remaining = self.expected_time - time.time()
+            if remaining <= 0:
+                return not self._stop_event.is_set()
+            if self._stop_event.wait(remaining):
+                return False
+
+    def _run(self):
+        """Trigger the callback on every deadline until stop() is called."""
+        while self._wait_for_deadline():
+            self._ontimer()
 
-        If _ontimer() triggers before expected_time or after expected_time_max,
-        this is an error that can cause the hourly save to be missed. Even worse
-        the creation of a new day could be missed. Let's create a warning on the
-        console if an issue with the timer reliabilitry is identified.
+    def _ontimer(self):
+        """Update the time properties and perform the callback.
+
+        If the trigger happens after expected_time + interval, at least one
+        deadline was missed. This is an error that can cause the hourly save
+        to be missed. Even worse the creation of a new day could be missed.
+        Let's create a warning on the console and continue with the most
+        recent deadline.
         """
-        with self.lock:     # only one timer callback at a time
+        with self.lock:
             self.time_now = time.time()
-            if (self.time_now < self.expected_time):
-                print(f"{datetime.fromtimestamp(self.time_now, timezone.utc)} busy waiting "
-                      f"{int((self.expected_time - self.time_now) * 1000000)} µs")
-                while self.time_now < self.expected_time:
-                    self.time_now = time.time()
+            self.lateness = self.time_now - self.expected_time
+            if self.record_timing:
+                self.timing.record('lateness', self.lateness)
+            missed = int((self.time_now - self.expected_time)
+                         // self.interval)
+            if missed > 0:
+                print("WARNING: Hard realtime violation in SidTimer. "
+                      f"{missed} deadline(s) missed, "
+                      f"expected: {self.expected_time} "
+                      f"found: {self.time_now}. "
+                      "Please report at "
+                      "'https://github.com/sberl/supersid/issues/107'. ")
+                self.missed_ticks += missed
+                self.expected_time += missed * self.interval
 
             self.utc_now = datetime.fromtimestamp(self.time_now, timezone.utc)
-            self._timer = threading.Timer(self.interval
-                                          + self.expected_time
-                                          - self.time_now, self._ontimer)
-            self._timer.start()
             self.data_index = int((self.utc_now.hour
                                    * 3600
                                    + self.utc_now.minute
                                    * 60 + self.utc_now.second) / self.interval)
-
-            expected_time_max = self.expected_time + self.interval
-            if (self.time_now < self.expected_time) or (self.time_now >= expected_time_max):
-                print("WARNING: Hard realtime violation in SidTimer._ontimer(). "
-                      f"expected: [{self.expected_time}..{expected_time_max}) "
-                      f"found: {self.time_now}. "
-                      "Please report at 'https://github.com/sberl/supersid/issues/107'. ")
-
             self.expected_time += self.interval
-            # callback to perform tasks
-            self.callback()
+
+        # callback to perform tasks,
+        # outside of the lock so that readers of the properties are not held
+        t_start = time.perf_counter()
+        self.callback()
+        if self.record_timing:
+            self.timing.record('callback', time.perf_counter() - t_start)
 
     def stop(self):
-        """Cancel the timer currently running in background."""
-        self._timer.cancel()
+        """Stop the scheduler thread, may be called from the callback."""
+        self._stop_event.set()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout=self.interval)
 
     def get_utc_now(self):
         """Get the UTC time now."""
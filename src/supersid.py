@@ -12,7 +12,8 @@ Then it creates its necessary elements:
     using the parameters read in the .cfg file
     Finally, it launches an infinite loop to wait for events:
     - User input (graphic or text)
-    - Timer for sampling
+    - Timer for sampling, the samples are passed through the pipeline
+      stages DSP and logging, each one running in its own thread
     - <still missing> network management with client-server protocol
 """
 import sys
@@ -21,13 +22,16 @@ import argparse
 import subprocess
 import time
 from datetime import datetime, timezone
-from matplotlib.mlab import psd as mlab_psd
+import numpy
 
 # SuperSID Package classes
 from sidtimer import SidTimer
 from supersid_sampler import Sampler
-from supersid_config import read_config, CONFIG_FILE_NAME
+from supersid_psd import get_psd_engine
+from supersid_pipeline import Pipeline
+from supersid_config import read_config, CONFIG_FILE_NAME, CALL_SIGN
 from supersid_logger import Logger
+from sidfile import SidBufferStore
 from supersid_common import exist_file, script_relative_to_cwd_relative, is_script
 
 class SuperSID:
@@ -42,6 +46,8 @@ class SuperSID:
         self.version = "EG 1.4 20150801"
         self.timer = None
         self.sampler = None
+        self.pipeline = None
+        self.writer = None
         self.viewer = None
 
         # read the configuration file or exit
@@ -51,12 +57,27 @@ class SuperSID:
             self.config['viewer'] = viewer
 
         # command line parameter -r/--read has precedence over automatic read
+        restore_journal = False
         if read_file is None:
-            # if there are hourly saves ...
-            if self.config['hourly_save'] == 'YES':
+            utcnow = datetime.now(timezone.utc)
+            utc_starttime = f"{utcnow.year}-{utcnow.month:02d}-{utcnow.day:02d} 00:00:00"
+            # the journal may start later in the day than the hourly
+            # saves (journaling switched on meanwhile), its readings are
+            # restored on top of the buffers read below
+            restore_journal = (
+                self.config['journal'] == 'YES'
+                and os.path.isfile(Logger.get_journal_filename(
+                    self.config, utc_starttime)))
+            # the memory mapped buffers of today are read by the Logger
+            if ((self.config['mmap_buffers'] == 'YES')
+                    and self.has_todays_buffers(utc_starttime)):
+                pass
+            # if there are hourly saves not covered by the journal ...
+            elif ((self.config['hourly_save'] == 'YES')
+                    and not (restore_journal
+                             and Logger.journal_starts_the_day(
+                                 self.config, utc_starttime))):
                 # ... figure out the file name ...
-                utcnow = datetime.now(timezone.utc)
-                utc_starttime = f"{utcnow.year}-{utcnow.month:02d}-{utcnow.day:02d} 00:00:00"
                 file_name = (f"{self.config['data_path']}"
                              f"hourly_current_buffers.raw.ext.{utc_starttime[:10]}.csv")
                 # ... check the existence ...
@@ -71,6 +92,13 @@ class SuperSID:
         if 'utc_starttime' not in self.config:
             self.config['utc_starttime'] = \
                 self.logger.sid_file.sid_params["utc_starttime"]
+        if restore_journal:
+            t_start = time.time()
+            readings = self.logger.restore_journal()
+            print(f"{readings} readings restored from the journal "
+                  f"in {time.time() - t_start:0.2f} sec")
+        if self.config['journal'] == 'YES':
+            self.logger.open_journal()
 
         # Create the viewer based on the .cfg specification (or set default):
         # Note: the list of Viewers can be extended provided they implement
@@ -88,6 +116,11 @@ class SuperSID:
             print("ERROR: Unknown viewer", self.config['viewer'])
             sys.exit(2)
 
+        # the tk viewer displays the full spectrum, only the text viewer
+        # can do with the power of the monitored stations
+        self.stations_only = (self.config['dsp_mode'] == 'stations'
+                              and self.config['viewer'] == 'text')
+
         # calculate Stations' buffer_size
         self.buffer_size = int(24*60*60 / self.config['log_interval'])
 
@@ -101,27 +134,76 @@ class SuperSID:
         else:
             self.sampler.set_monitored_frequencies(self.config.stations)
 
+        # continue the capture statistics of today after a restart
+        stats_file_name = self.logger.get_capture_stats_filename()
+        if os.path.isfile(stats_file_name):
+            self.sampler.stats.load(stats_file_name)
+
         # Link the logger.sid_file.data buffers to the config.stations
         for ibuffer, station in enumerate(self.config.stations):
             station['raw_buffer'] = self.logger.sid_file.data[ibuffer]
 
+        # the capture (on_timer) passes the samples to the DSP stage,
+        # the DSP stage passes the signal strengths to the logging stage
+        self.pipeline = Pipeline(("dsp", self.on_dsp),
+                                 ("logging", self.on_logging))
+        # the logging stage passes snapshots of the buffers to the writer
+        self.writer = Pipeline(("writer", self.on_write))
+
         # Create Timer
         self.viewer.status_display("Waiting for Timer ... ")
-        self.timer = SidTimer(self.config['log_interval'], self.on_timer)
+        # the timings of a tick are recorded with its reading by the
+        # logging stage, on the right side of the midnight rollover
+        self.timer = SidTimer(self.config['log_interval'], self.on_timer,
+                              record_timing=False)
         self.hour = self.timer.utc_now.hour     # detection of the hour change
 
+        # the timings depend on these settings
+        self.timer.timing.settings = {
+            'audio': self.config['Audio'],
+            'audio_sampling_rate': self.sampler.audio_sampling_rate,
+            'Channels': self.config['Channels'],
+            'NFFT': self.sampler.NFFT,
+            'log_interval': self.config['log_interval'],
+            'Streaming': self.config['Streaming'],
+            'dsp_mode': self.config['dsp_mode'],
+            'viewer': self.config['viewer'],
+        }
+        # continue the timing statistics of today after a restart
+        timing_file_name = self.logger.get_timing_stats_filename()
+        if os.path.isfile(timing_file_name):
+            self.timer.timing.load(timing_file_name)
+
+    def has_todays_buffers(self, utc_starttime):
+        """Return True if the memory mapped buffers hold today's readings.
+
+        The buffers of other stations, in another order or of another log
+        interval are not restored: the Logger recreates them empty.
+        """
+        header = SidBufferStore.read_header(
+            Logger.get_buffers_filename(self.config))
+        log_interval = self.config['log_interval']
+        return (SidBufferStore.has_layout(
+                    header,
+                    [station[CALL_SIGN] for station in self.config.stations],
+                    log_interval, int((24 * 3600) / log_interval))
+                and header['utc_starttime'][:10] == utc_starttime[:10])
+
     def clear_all_data_buffers(self):
         """Clear the current memory buffers and pass to the next day."""
         self.logger.sid_file.clear_buffer(next_day=True)
+        if self.config['journal'] == 'YES':
+            self.logger.open_journal()
 
     def ftp_to_stanford(self):
         """
         Call 'ftp_to_stanford.py -y' in a separate process to prevent
         interference with data capture.
 
-        As of today, the -y option of ftp_to_stanford.py expects to find
-        a supersid formated file of yesterday with the name
-        <data_path>/<site_name>_yyyy-mm-dd.csv.
+        As of today, the -y option of ftp_to_stanford.py looks up a
+        supersid formated file of yesterday and of the site in the index of
+        the data_path folder, named <data_path>/<site_name>_yyyy-mm-dd.csv
+        or .sidb.
 
         Files with this naming scheme are created with either one of
             log_format = supersid_format
@@ -153,8 +235,13 @@ class SuperSID:
     def on_timer(self):
         """Call when timer expires.
 
-        Triggered by SidTimer every 'log_interval' seconds
+        Triggered by SidTimer every 'log_interval' seconds.
+        This is the capture stage, the samples are passed to the pipeline
+        which does the DSP and the logging in its own threads. The capture
+        statistics and timings of the tick are passed along, the logging
+        stage records them.
         """
+        t_callback = time.perf_counter()
         # current_index is the position in the buffer calculated
         # from current UTC time
         current_index = self.timer.data_index
@@ -163,18 +250,47 @@ class SuperSID:
         # Get new data and pass them to the View
         message = f"{self.timer.get_utc_now()}  [{current_index}]  Capturing data..."
         self.viewer.status_display(message)
+        samples = None
+        timings = {'lateness': self.timer.lateness}
+        # capture_1sec() returns the samples of all channels,
+        # may set sampler_ok = False or fail for this tick only
+        data = self.sampler.capture_1sec()
+        if self.sampler.sampler_ok and len(data):
+            # the sampler reuses its buffer for the next capture
+            samples = numpy.array(data)
+            timings['capture'] = getattr(self.sampler.capture_device,
+                                         'duration', None)
+        timings['callback'] = time.perf_counter() - t_callback
+        self.pipeline.submit({
+            'data_index': current_index,
+            'utc_now': utc_now,
+            'samples': samples,
+            'tick_counts': self.sampler.tick_counts,
+            'timings': timings,
+            'pxx': None,
+        })
+
+    def on_dsp(self, record):
+        """DSP stage: calculate the signal strengths of the record."""
+        timings = record['timings']
+        data = record['samples']
         signal_strengths = []
-        data = []
         try:
-            # capture_1sec() returns list of signal strength,
-            # may set sampler_ok = False
-            data = self.sampler.capture_1sec()
-
-            if self.sampler.sampler_ok:
+            t_start = time.perf_counter()
+            if data is not None and self.stations_only:
+                signal_strengths = self.get_station_psd(
+                    data, self.sampler.NFFT,
+                    self.sampler.audio_sampling_rate)
+                timings['psd'] = time.perf_counter() - t_start
+            elif data is not None:
                 pxx, freqs = self.get_psd(data, self.sampler.NFFT,
                                       self.sampler.audio_sampling_rate)
+                timings['psd'] = time.perf_counter() - t_start
                 if pxx is not None:
-                    self.viewer.update_psd(pxx, freqs)
+                    # the engine reuses pxx, the viewer gets its own copy
+                    # from the logging stage, a slow viewer must not hold
+                    # the DSP up
+                    record['pxx'], record['freqs'] = pxx.copy(), freqs
                     for channel, bin_sample in zip(
                             self.sampler.monitored_channels,
                             self.sampler.monitored_bins):
@@ -189,67 +305,103 @@ class SuperSID:
         # signal_strengths may not have the expected length
         while len(signal_strengths) < len(self.sampler.monitored_bins):
             signal_strengths.append(0.0)
+        record['signal_strengths'] = signal_strengths
+        record['samples'] = None    # not needed any more
+        return record
+
+    def on_logging(self, record):
+        """Logging stage: save the signal strengths, hourly and daily files."""
+        timing = self.timer.timing
+        current_index = record['data_index']
+        utc_now = record['utc_now']
+        signal_strengths = record['signal_strengths']
 
         # do we need to save some files (hourly) or switch to a new day?
-        if self.hour != self.timer.utc_now.hour:    # Did the hour change?
-            self.hour = self.timer.utc_now.hour     # Yes, it changed!
+        if self.hour != utc_now.hour:    # Did the hour change?
+            self.hour = utc_now.hour     # Yes, it changed!
+            print(f"{utc_now} timing of the last hour\n"
+                  + timing.report_hour(utc_now) + "\n"
+                  + self.pipeline.status())
             if self.config['hourly_save'] == 'YES':
-                file_name = (f"hourly_current_buffers.raw.ext."
-                             f"{self.logger.sid_file.sid_params['utc_starttime'][:10]}.csv")
-
-                time_info = f"{self.timer.utc_now} saving {file_name}"
-                t_start = time.time()
-                self.save_current_buffers(filename=file_name,
-                                          log_type='raw',
-                                          log_format='supersid_extended')
-                print(f"{time_info} in {time.time() - t_start:0.1f} sec")
+                self.save_hourly_snapshot()
 
             # a new day!
-            if self.timer.utc_now.hour == 0:
+            if utc_now.hour == 0:
                 # use log_type and log_format requested by the user
-                # in the .cfg
-
-                time_info = f"{datetime.now(timezone.utc)} saving yesterdays files "
-                t_start = time.time()
-                self.save_current_buffers(log_type=self.config['log_type'],
-                                          log_format=self.config['log_format'])
-                print(f"{time_info} in {time.time() - t_start:0.1f} sec")
+                # in the .cfg, the upload needs the saved files
+                self.writer.submit({
+                    'description': "yesterdays files",
+                    'filename': '',
+                    'sid_file': self.logger.sid_file.snapshot(),
+                    'log_type': self.config['log_type'],
+                    'log_format': self.config['log_format'],
+                    'upload': True,
+                    'end_of_day': True,
+                })
+
+                self.logger.log_capture_stats(self.sampler.stats)
+                self.sampler.stats.clear()
+                self.logger.log_timing_stats(timing)
+                timing.clear()
 
                 self.clear_all_data_buffers()
 
-                time_info = f"{datetime.now(timezone.utc)} ftp to Stanford "
-                t_start = time.time()
-                self.ftp_to_stanford()
-                print(f"{time_info} in {time.time() - t_start:0.1f} sec")
+        # the statistics of this tick belong to the day of utc_now,
+        # recorded after the midnight rollover above
+        tick_flags = self.sampler.stats.record(current_index, utc_now,
+                                               record['tick_counts'])
+        for name, seconds in record['timings'].items():
+            timing.record(name, seconds)
+        if record['pxx'] is not None:
+            t_start = time.perf_counter()
+            self.viewer.update_psd(record['pxx'], record['freqs'])
+            timing.record('viewer', time.perf_counter() - t_start)
 
         # Save signal strengths into memory buffers
         # prepare message for status bar
-        message = f"{self.timer.get_utc_now()}  [{current_index}]  "
+        message = f"{utc_now.strftime('%Y-%m-%d %H:%M:%S.%f')}  [{current_index}]  "
         for station, strength in zip(self.config.stations,
                                      signal_strengths):
             station['raw_buffer'][current_index] = strength
             message += f"{station['call_sign']}={strength:.4f} "
-        self.logger.sid_file.timestamp[current_index] = utc_now
+        self.logger.sid_file.set_timestamp(current_index, utc_now)
+        self.logger.log_journal(current_index, utc_now, signal_strengths)
+        if tick_flags:
+            message += "! "     # this reading is unreliable
+        message += self.sampler.stats.status()
+        if self.pipeline.backlog():
+            message += " " + self.pipeline.status()
 
         # end of this thread/need to handle to View to display
         # captured data & message
         self.viewer.status_display(message)
 
     def get_psd(self, data, nfft, fs):
-        """Call 'psd', calculates the spectrum."""
+        """Calculate the spectrum of all channels.
+
+        pxx[channel] is the spectrum of one channel, pxx is reused by the
+        next call.
+        """
         try:
-            pxx = {}
-            freqs = []
-            for channel in range(self.config['Channels']):
-                pxx[channel], freqs = \
-                    mlab_psd(data[:, channel], NFFT=nfft, Fs=fs)
+            pxx, freqs = get_psd_engine(nfft, fs).psd(
+                data[:, :self.config['Channels']])
         except RuntimeError as err_re:
             print("Warning:", err_re)
             pxx, freqs = None, None
         return pxx, freqs
 
+    def get_station_psd(self, data, nfft, fs):
+        """Calculate the spectrum at the monitored bins only."""
+        try:
+            return list(get_psd_engine(nfft, fs).station_psd(
+                data, self.sampler.monitored_channels,
+                self.sampler.monitored_bins))
+        except RuntimeError as err_re:
+            print("Warning:", err_re)
+            return []
+
     def save_current_buffers(self, filename='', log_type='raw',
-                             log_format='both'):
+                             log_format='both', sid_file=None):
         """Save buffer data from logger.sid_file.
 
         log_type = raw or filtered
@@ -259,23 +411,64 @@ class SuperSID:
                    | supersid_extended
                    | both
                    | both_extended
+        sid_file = snapshot of logger.sid_file to save instead
         """
         filenames = []
         if log_format.startswith('both') or log_format.startswith('sid'):
             fnames = self.logger.log_sid_format(
                 self.config.stations,
                 log_type=log_type,
-                extended=log_format.endswith('extended'))
+                extended=log_format.endswith('extended'),
+                sid_file=sid_file)
             filenames += fnames
         if log_format.startswith('both') or log_format.startswith('supersid'):
             fnames = self.logger.log_supersid_format(
                 self.config.stations,
                 filename,
                 log_type=log_type,
-                extended=log_format.endswith('extended'))
+                extended=log_format.endswith('extended'),
+                sid_file=sid_file)
             filenames += fnames
         return filenames
 
+    def save_hourly_snapshot(self):
+        """Let the writer save the raw buffers to the hourly file."""
+        sid_file = self.logger.sid_file.snapshot()
+        file_name = (f"hourly_current_buffers.raw.ext."
+                     f"{sid_file.sid_params['utc_starttime'][:10]}.csv")
+        self.writer.submit({
+            'description': file_name,
+            'filename': file_name,
+            'sid_file': sid_file,
+            'log_type': 'raw',
+            'log_format': 'supersid_extended',
+            'upload': False,
+            'end_of_day': False,
+        })
+
+    def on_write(self, job):
+        """Persistence stage: save a snapshot of the buffers.
+
+        The files are written in the background, the recording continues
+        in the live buffers meanwhile.
+        """
+        time_info = f"{datetime.now(timezone.utc)} saving {job['description']}"
+        t_start = time.time()
+        self.save_current_buffers(filename=job['filename'],
+                                  log_type=job['log_type'],
+                                  log_format=job['log_format'],
+                                  sid_file=job['sid_file'])
+        print(f"{time_info} in {time.time() - t_start:0.1f} sec")
+        if job['end_of_day']:
+            # the day's files are written, its journal is not needed any more
+            self.logger.remove_journal(
+                job['sid_file'].sid_params['utc_starttime'])
+        if job['upload']:
+            time_info = f"{datetime.now(timezone.utc)} ftp to Stanford "
+            t_start = time.time()
+            self.ftp_to_stanford()
+            print(f"{time_info} in {time.time() - t_start:0.1f} sec")
+
     def on_close(self):
         """Handle the close event of the application."""
         self.close()
@@ -288,16 +481,32 @@ class SuperSID:
     def close(self):
         """Call all necessary stop/close functions of children objects."""
         self.__class__.running = False
-        if self.config['hourly_save'] == 'YES':
+        if self.timer:
+            self.timer.stop()
+        if self.pipeline:
+            # finish the readings captured so far
+            self.pipeline.stop()
+        if self.writer:
+            if self.config['hourly_save'] == 'YES':
+                self.save_hourly_snapshot()
+            # wait for the files to be written
+            self.writer.stop()
+        elif self.config['hourly_save'] == 'YES':
             file_name = (f"hourly_current_buffers.raw.ext."
                         f"{self.logger.sid_file.sid_params['utc_starttime'][:10]}.csv")
             self.save_current_buffers(filename=file_name,
                                       log_type='raw',
                                       log_format='supersid_extended')
         if self.sampler:
+            if self.sampler.stats.ticks:
+                self.logger.log_capture_stats(self.sampler.stats)
             self.sampler.close()
         if self.timer:
-            self.timer.stop()
+            if self.timer.timing.day:
+                self.logger.log_timing_stats(self.timer.timing)
+        self.logger.close_journal()
+        if self.logger.sid_file.store is not None:
+            self.logger.sid_file.store.flush()
         if self.viewer:
             self.viewer.close()
 
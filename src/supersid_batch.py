@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Render the plots of many SID/SuperSID files in one run, without display.
+
+The reports are given by a directory, one report per data file, or by a
+JSON manifest:
+
+    [
+        {"files": ["../Data/SITE_2026-10-01.csv"],
+         "output": "../Plots/SITE_2026-10-01.png"},
+        {"files": ["../Data/SITE_2026-09-*.csv"],
+         "output": "../Plots/SITE_2026-09.pdf"}
+    ]
+
+Relative paths are relative to the manifest. The plots look like those of
+supersid_plot.py. They are drawn with the Agg backend by a pool of worker
+processes, each reusing one figure for all its reports. A report whose
+input files are unchanged since its last rendering is skipped: the
+signature of the inputs (modification time and size, or content hash with
+--hash) and of the plot settings (paper size, station colors) is kept in
+'supersid_batch.json' in the output directory, or next to the manifest.
+
+Examples:
+    supersid_batch.py ../Data -o ../Plots -f png
+    supersid_batch.py reports.json -j 4
+"""
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import FuncFormatter as ff
+import matplotlib.dates
+
+from sidfile import SidFile
+from sidarchive import SidArchive
+from supersid_lod import choose_level, envelope_line, minmax_indices
+from supersid_plot_common import read_plot_data, m2hm, m2yyyymmdd, \
+    PAPER_SIZE
+from supersid_config import read_config, CONFIG_FILE_NAME
+
+STATE_FILENAME = "supersid_batch.json"
+COLORS = "brgcmy"   # station colors if not configured
+
+_template = None    # (figure, axes) of this worker process
+
+
+def get_template():
+    """Return the figure and axes of this process, empty."""
+    global _template
+    if _template is None:
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        axes.xaxis.set_minor_locator(matplotlib.dates.HourLocator())
+        axes.xaxis.set_major_locator(matplotlib.dates.DayLocator())
+        axes.xaxis.set_major_formatter(ff(m2yyyymmdd))
+        axes.xaxis.set_minor_formatter(ff(m2hm))
+        axes.xaxis.axis_date()
+        axes.set_xlabel("UTC Time")
+        axes.set_ylabel("Signal Strength")
+        _template = (figure, axes)
+    figure, axes = _template
+    # keep the axes with their locators and formatters, drop the curves
+    for artist in list(axes.lines) + list(axes.collections):
+        artist.remove()
+    if axes.get_legend():
+        axes.get_legend().remove()
+    axes.relim()
+    axes.autoscale()
+    return figure, axes
+
+
+def render_report(report):
+    """Draw the report's files into its output, return a status message."""
+    t_start = time.perf_counter()
+    figure, axes = get_template()
+    filenames = sorted(report['files'])
+    sid_files = [SidFile(filename, lazy=True) for filename in filenames]
+    nb_days = len({sid_file.startTime for sid_file in sid_files})
+    height, width = PAPER_SIZE[report['paper_size']]
+    if nb_days == 1:
+        figure.set_size_inches(width, height)
+    else:
+        figure.set_size_inches(width * nb_days / 2.0, height / 2.0)
+    pixels = figure.get_size_inches()[0] * figure.dpi
+    colors = dict(report['colors'])
+    labels = set()  # stations already in the legend
+    for filename, sid_file in zip(filenames, sid_files):
+        level = choose_level(nb_days * 24 * 60 * 60, pixels,
+                             sid_file.LogInterval) \
+            if report['lod_cache'] else None
+        for station, arrays in read_plot_data(filename, level,
+                                              report['lod_cache']).items():
+            label = None
+            if station not in labels:
+                label = station
+                colors.setdefault(
+                    station, COLORS[len(labels) % len(COLORS)] + '-')
+                labels.add(station)
+            if level:
+                timestamps, minimum, maximum, _ = arrays
+                axes.plot(*envelope_line(timestamps, minimum, maximum),
+                          colors[station], label=label)
+            else:
+                # minimum and maximum reading per pixel column
+                timestamps, values = arrays
+                indices = minmax_indices(values, pixels)
+                axes.plot(timestamps[indices], values[indices],
+                          colors[station], label=label)
+    for label in axes.xaxis.get_majorticklabels():
+        label.set_fontsize(8)
+        label.set_rotation(30)
+    for label in axes.xaxis.get_minorticklabels():
+        label.set_fontsize(12 if nb_days == 1 else 8)
+    figure.suptitle(", ".join(os.path.splitext(os.path.basename(filename))[0]
+                              for filename in filenames))
+    axes.legend()
+    figure.tight_layout()
+    os.makedirs(os.path.dirname(os.path.abspath(report['output'])),
+                exist_ok=True)
+    figure.savefig(report['output'])
+    return f"{report['output']} rendered in " \
+        f"{time.perf_counter() - t_start:.2f} s"
+
+
+def signature(filenames, content_hash=False, settings=None):
+    """Return the hex digest identifying the state of the input files.
+
+    settings is a JSON serializable dictionary of what else the output
+    depends on.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    for filename in sorted(filenames):
+        digest.update(os.path.abspath(filename).encode())
+        if content_hash:
+            with open(filename, "rb") as fin:
+                for block in iter(lambda: fin.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            stat = os.stat(filename)
+            digest.update(f"{stat.st_mtime_ns} {stat.st_size}".encode())
+    return digest.hexdigest()
+
+
+def read_manifest(filename):
+    """Return the reports of a JSON manifest, paths made absolute."""
+    folder = os.path.dirname(os.path.abspath(filename))
+    with open(filename, encoding="utf-8") as fin:
+        manifest = json.load(fin)
+    reports = []
+    for entry in manifest:
+        files = []
+        for pattern in entry['files']:
+            files += glob.glob(os.path.join(folder,
+                                            os.path.expanduser(pattern)))
+        reports.append({'files': files,
+                        'output': os.path.join(folder, entry['output'])})
+    return reports, folder
+
+
+def read_directory(folder, output_folder, extension):
+    """Return one report per SID/SuperSID file of folder."""
+    reports = []
+    for pattern in SidArchive.PATTERNS:
+        for filename in sorted(glob.glob(os.path.join(folder, pattern))):
+            if SidArchive.is_sid_file(filename):
+                basename = os.path.splitext(os.path.basename(filename))[0]
+                reports.append({
+                    'files': [filename],
+                    'output': os.path.join(output_folder,
+                                           basename + extension)})
+    return reports
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+    parser.add_argument(
+        "source",
+        help="folder of data files or JSON manifest of the reports")
+    parser.add_argument(
+        "-o", "--output",
+        dest="output_folder",
+        help="folder of the plots of a data folder, default is the data "
+        "folder")
+    parser.add_argument(
+        "-f", "--format",
+        dest="format",
+        default="png",
+        help="file format of the plots of a data folder, default=png")
+    parser.add_argument(
+        "-c", "--config",
+        dest="cfg_filename",
+        default=None,
+        help="Supersid configuration file for the paper size and the "
+        f"station colors, for example {CONFIG_FILE_NAME}")
+    parser.add_argument(
+        "-j", "--jobs",
+        dest="jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes, default is the number of CPUs")
+    parser.add_argument(
+        "--lod-cache",
+        dest="lod_cache",
+        default=None,
+        help="Folder to cache min/max envelopes of the data files in, "
+        "plotted instead of the readings of long periods. Default is no "
+        "cache.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Render all reports, changed inputs or not")
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        dest="content_hash",
+        help="Compare the content of the input files instead of their "
+        "modification time and size")
+    args = parser.parse_args()
+
+    paper_size = "A4"
+    colors = {}
+    if args.cfg_filename:
+        config = read_config(args.cfg_filename)
+        paper_size = config.get("paper_size", paper_size)
+        colors = {station['call_sign']: station['color']
+                  for station in config.stations if station['color']}
+
+    if os.path.isdir(args.source):
+        output_folder = args.output_folder or args.source
+        os.makedirs(output_folder, exist_ok=True)
+        reports = read_directory(args.source, output_folder,
+                                 "." + args.format.lstrip("."))
+        state_folder = output_folder
+    else:
+        reports, state_folder = read_manifest(args.source)
+    state_filename = os.path.join(state_folder, STATE_FILENAME)
+    state = {}
+    if os.path.isfile(state_filename) and not args.force:
+        with open(state_filename, encoding="utf-8") as fin:
+            state = json.load(fin)
+
+    pending = []
+    for report in reports:
+        if not report['files']:
+            print(f"Warning: no input file for {report['output']}")
+            continue
+        report.update(paper_size=paper_size, colors=colors,
+                      lod_cache=args.lod_cache)
+        report['signature'] = signature(
+            report['files'], args.content_hash,
+            {key: report[key] for key in ('paper_size', 'colors')})
+        if (state.get(os.path.abspath(report['output']))
+                == report['signature']
+                and os.path.isfile(report['output'])):
+            continue
+        pending.append(report)
+    print(f"{len(pending)} of {len(reports)} reports to render")
+
+    t_start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [(report, executor.submit(render_report, report))
+                   for report in pending]
+        for report, future in futures:
+            try:
+                print(future.result())
+                state[os.path.abspath(report['output'])] = \
+                    report['signature']
+            except Exception as err:
+                failed += 1
+                print(f"Error: {report['output']} failed, {err}")
+    with open(state_filename, "w", encoding="utf-8") as fout:
+        json.dump(state, fout, indent=1)
+    print(f"{len(pending) - failed} reports rendered in "
+          f"{time.perf_counter() - t_start:.2f} s")
+    sys.exit(1 if failed else 0)
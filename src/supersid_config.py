@@ -124,6 +124,12 @@ class Config(dict):
                 # yes/no to save every hour
                 ('hourly_save', str, "no"),
 
+                # yes/no to append each reading to a binary journal
+                ('journal', str, "no"),
+
+                # yes/no to keep the buffers in a memory mapped file
+                ('mmap_buffers', str, "no"),
+
                 # data path configuration by the user
                 ('data_path', str, "../Data/"),
 
@@ -134,6 +140,10 @@ class Config(dict):
                 # text, tk (default)
                 ('viewer', str, 'tk'),
 
+                # full (default), stations
+                # stations computes only the monitored bins (text viewer)
+                ('dsp_mode', str, 'full'),
+
                 # beta_wing for sidfile.filter_buffer()
                 ('bema_wing', int, 6),
 
@@ -194,6 +204,10 @@ class Config(dict):
                 # alsaaudio, sounddevice, pyaudio: number of channels to be captured
                 # default 1, optional 2
                 ("Channels", int, 1),
+
+                # alsaaudio, sounddevice, pyaudio: yes/no capture continuously
+                # in a background thread
+                ("Streaming", str, "no"),
             ),
 
             'Linux': (                              # obsolete
@@ -254,6 +268,10 @@ class Config(dict):
                 # sounddevice, pyaudio: number of channels to be captured
                 # default 1, optional 2
                 ("Channels", int, 1),
+
+                # sounddevice, pyaudio: yes/no capture continuously
+                # in a background thread
+                ("Streaming", str, "no"),
             )
 
         self.sectionfound = set()
@@ -392,6 +410,30 @@ class Config(dict):
                 "in supersid.cfg. Please check."
             return
 
+        # 'journal' must be UPPER CASE
+        self['journal'] = self['journal'].upper()
+        if self['journal'] not in ('YES', 'NO'):
+            self.config_ok = False
+            self.config_err = "'journal' must be either 'YES' or 'NO' " \
+                "in supersid.cfg. Please check."
+            return
+
+        # 'mmap_buffers' must be UPPER CASE
+        self['mmap_buffers'] = self['mmap_buffers'].upper()
+        if self['mmap_buffers'] not in ('YES', 'NO'):
+            self.config_ok = False
+            self.config_err = "'mmap_buffers' must be either 'YES' or 'NO' " \
+                "in supersid.cfg. Please check."
+            return
+
+        # 'Streaming' must be UPPER CASE
+        self['Streaming'] = self['Streaming'].upper()
+        if self['Streaming'] not in ('YES', 'NO'):
+            self.config_ok = False
+            self.config_err = "'Streaming' must be either 'YES' or 'NO' " \
+                "in supersid.cfg. Please check."
+            return
+
         # when present, 'email_tls' must be UPPER CASE
         if 'email_tls' in self:
             self['email_tls'] = self['email_tls'].upper()
@@ -450,6 +492,14 @@ class Config(dict):
             self.config_err = "'viewer' must be either one of 'text', 'tk'."
             return
 
+        # check dsp_mode
+        self['dsp_mode'] = self['dsp_mode'].lower()
+        if self['dsp_mode'] not in ('full', 'stations'):
+            self.config_ok = False
+            self.config_err = "'dsp_mode' must be either one of 'full', " \
+                "'stations'."
+            return
+
         # Check the 'data_path' validity
         # and create it as a Config instance property
         self['data_path'] = script_relative_to_cwd_relative(self['data_path'])\
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Level of detail (LOD) pyramid of SID and SuperSID files for plotting.
+
+A month of 5 second readings is half a million points per station, far
+more than the pixels of a plot. Lod keeps, per station, the minimum,
+maximum and mean of the readings in bins of 1 minute, 10 minutes and 1
+hour. Drawing the min/max envelope of the bins of about one pixel looks
+like the full resolution plot at a fraction of the points.
+
+get_lod(filename, cache_folder=folder) builds the pyramid once and caches
+it in folder as <filename>.lod.npz, the cache is rebuilt when the data file
+is modified. Without cache folder nothing is written. choose_level() picks
+the level for a time span and a plot width, none if the readings fit.
+
+Decimator draws the minimum and maximum of the readings of each pixel
+column of the visible range only, and recomputes them when the user zooms
+or pans, down to the full resolution. An envelope is replaced by the
+readings when the zoom goes beyond its resolution.
+
+Running this module directly builds the pyramids of the given files in a
+cache folder and prints their size.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy
+import matplotlib.dates
+
+from sidfile import SidFile, atomic_write
+
+LEVELS = (60, 600, 3600)    # seconds per bin
+LOD_EXTENSION = ".lod.npz"
+
+
+def build_envelope(timestamps, data, seconds):
+    """Return timestamps, minimum, maximum, mean of the bins of seconds.
+
+    data has one row per station. Bins are aligned to the epoch, hence to
+    the day, the timestamps are the start of the bins. Bins without
+    readings are left out.
+    """
+    order = numpy.argsort(timestamps, kind='stable')
+    timestamps, data = timestamps[order], data[:, order]
+    bins = timestamps.astype('datetime64[us]').astype(numpy.int64) \
+        // (seconds * 1000000)
+    bin_numbers, starts = numpy.unique(bins, return_index=True)
+    counts = numpy.diff(numpy.append(starts, len(bins)))
+    return ((bin_numbers * seconds * 1000000).astype('datetime64[us]'),
+            numpy.minimum.reduceat(data, starts, axis=1),
+            numpy.maximum.reduceat(data, starts, axis=1),
+            numpy.add.reduceat(data, starts, axis=1) / counts)
+
+
+def choose_level(span, pixels, interval, levels=LEVELS):
+    """Return the level (seconds) to plot span seconds on pixels.
+
+    That is the coarsest level with at least one bin per pixel. None means
+    the readings of interval seconds have to be plotted as they are, also
+    if there are no more than two readings per pixel.
+    """
+    if span / interval <= 2 * pixels:
+        return None
+    seconds_per_pixel = span / max(pixels, 1)
+    candidates = [level for level in levels
+                  if interval < level <= seconds_per_pixel]
+    return max(candidates) if candidates else None
+
+
+def envelope_line(timestamps, minimum, maximum):
+    """Return timestamps, values of a line through the minimum and maximum
+    of each bin, which looks like the line of the readings."""
+    return numpy.repeat(timestamps, 2), \
+        numpy.column_stack((minimum, maximum)).ravel()
+
+
+def minmax_indices(values, columns):
+    """Return the sorted indices of the min and max of columns buckets.
+
+    The readings are split in columns buckets of equal count, the first
+    and last readings are always kept. All indices are returned if there
+    are no more than two readings per bucket.
+    """
+    count = len(values)
+    if count <= 2 * columns:
+        return numpy.arange(count)
+    size = -(-count // int(columns))   # readings per bucket, rounded up
+    buckets = count // size
+    body = values[:buckets * size].reshape(buckets, size)
+    offsets = numpy.arange(buckets) * size
+    return numpy.unique(numpy.concatenate((
+        body.argmin(axis=1) + offsets, body.argmax(axis=1) + offsets,
+        numpy.arange(buckets * size, count), [0, count - 1])))
+
+
+class Decimator():
+    """Plot curves on axes with the min/max of each visible pixel column.
+
+    The full readings are kept, each change of the x limits (zoom, pan,
+    home) selects the visible readings again, so zooming into a flare
+    shows every reading. A curve plotted from an envelope loads the
+    readings when the zoom requires a finer resolution.
+    """
+
+    def __init__(self, axes, columns=None):
+        self.axes = axes
+        self.columns = columns  # default is the width of the axes
+        # [line, date numbers, timestamps, values, seconds per bin of an
+        # envelope or None, loader of the readings of an envelope]
+        self.curves = []
+        # the axes keep a weak reference to a bound method only, the
+        # decimator lives as long as the axes through the lambda
+        axes.callbacks.connect('xlim_changed',
+                               lambda axes: self.on_xlim_changed(axes))
+
+    def get_columns(self):
+        return max(self.columns or 0, self.axes.bbox.width, 1)
+
+    def select(self, dates, xlim=None):
+        """Return the slice of dates within xlim, one reading beyond."""
+        if xlim is None:
+            return slice(0, len(dates))
+        start, stop = numpy.searchsorted(dates, xlim)
+        return slice(max(start - 1, 0), min(stop + 1, len(dates)))
+
+    def decimate(self, dates, values, xlim=None):
+        visible = self.select(dates, xlim)
+        return visible.start + minmax_indices(values[visible],
+                                              self.get_columns())
+
+    def plot(self, timestamps, values, *args, seconds=None, loader=None,
+             **kwargs):
+        """Plot the decimated curve like axes.plot(), return its line."""
+        timestamps, values = numpy.asarray(timestamps), \
+            numpy.asarray(values)
+        dates = matplotlib.dates.date2num(timestamps)
+        indices = self.decimate(dates, values)
+        line, = self.axes.plot(timestamps[indices], values[indices],
+                               *args, **kwargs)
+        self.curves.append([line, dates, timestamps, values, seconds,
+                            loader])
+        return line
+
+    def plot_envelope(self, timestamps, minimum, maximum, seconds, loader,
+                      *args, **kwargs):
+        """Plot the envelope of bins of seconds like the readings.
+
+        loader() returns the timestamps, values of the readings, called
+        when zooming in to less than seconds per pixel.
+        """
+        return self.plot(*envelope_line(timestamps, minimum, maximum),
+                         *args, seconds=seconds, loader=loader, **kwargs)
+
+    def on_xlim_changed(self, axes):
+        xlim = sorted(axes.get_xlim())
+        seconds_per_pixel = (xlim[1] - xlim[0]) * 24 * 60 * 60 \
+            / self.get_columns()
+        for curve in self.curves:
+            line, _, _, _, seconds, loader = curve
+            if seconds is not None and seconds_per_pixel < seconds:
+                timestamps, values = loader()
+                curve[1:] = [matplotlib.dates.date2num(timestamps),
+                             numpy.asarray(timestamps),
+                             numpy.asarray(values), None, None]
+            _, dates, timestamps, values, _, _ = curve
+            indices = self.decimate(dates, values, xlim)
+            line.set_data(timestamps[indices], values[indices])
+
+
+class Lod():
+    """Min/max/mean envelopes of the stations of one file per level."""
+
+    def __init__(self, stations, envelopes):
+        self.stations = list(stations)
+        # level -> (timestamps, minimum, maximum, mean)
+        self.envelopes = envelopes
+
+    @classmethod
+    def build(cls, sid_file, levels=LEVELS):
+        return cls(sid_file.stations,
+                   {level: build_envelope(sid_file.timestamp, sid_file.data,
+                                          level)
+                    for level in levels})
+
+    def get(self, station, level):
+        """Return timestamps, minimum, maximum, mean of station at level."""
+        timestamps, minimum, maximum, mean = self.envelopes[level]
+        index = self.stations.index(station)
+        return timestamps, minimum[index], maximum[index], mean[index]
+
+    def save(self, filename, source, source_mtime):
+        arrays = {}
+        for level, (timestamps, minimum, maximum, mean) \
+                in self.envelopes.items():
+            arrays[f"timestamps_{level}"] = timestamps.astype(numpy.int64)
+            arrays[f"minimum_{level}"] = minimum
+            arrays[f"maximum_{level}"] = maximum
+            arrays[f"mean_{level}"] = mean
+        with atomic_write(filename, binary=True) as fout:
+            numpy.savez(fout, stations=numpy.array(self.stations),
+                        levels=numpy.array(list(self.envelopes)),
+                        source=source, source_mtime=source_mtime, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """Return the Lod, the path and modification time of its source."""
+        with numpy.load(filename) as npz:
+            envelopes = {
+                int(level): (
+                    npz[f"timestamps_{level}"].astype('datetime64[us]'),
+                    npz[f"minimum_{level}"],
+                    npz[f"maximum_{level}"],
+                    npz[f"mean_{level}"])
+                for level in npz['levels']}
+            return (cls(npz['stations'].tolist(), envelopes),
+                    str(npz['source']), float(npz['source_mtime']))
+
+
+def get_lod(filename, sid_file=None, levels=LEVELS, cache_folder=None):
+    """Return the Lod of filename, from the cache folder if up to date.
+
+    sid_file may be the already read filename. Without cache_folder the
+    Lod is built and not saved. The cache is not written if the folder is
+    read only.
+    """
+    if cache_folder is None:
+        return Lod.build(sid_file or SidFile(filename), levels)
+    lod_filename = os.path.join(cache_folder,
+                                os.path.basename(filename) + LOD_EXTENSION)
+    source = os.path.abspath(filename)
+    source_mtime = os.path.getmtime(filename)
+    if os.path.isfile(lod_filename):
+        try:
+            lod, cached_source, cached_mtime = Lod.load(lod_filename)
+            if cached_source == source and cached_mtime == source_mtime \
+                    and all(level in lod.envelopes for level in levels):
+                return lod
+        except (OSError, KeyError, ValueError):
+            pass    # rebuild a damaged cache
+    lod = Lod.build(sid_file or SidFile(filename), levels)
+    try:
+        os.makedirs(cache_folder, exist_ok=True)
+        lod.save(lod_filename, source, source_mtime)
+    except OSError as err:
+        print(f"Warning: {lod_filename} not written, {err}")
+    return lod
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Build the level of detail caches of SID files")
+    parser.add_argument(
+        'file_list',
+        metavar='file.csv',
+        nargs='+',
+        help='SID/SuperSID file(s)')
+    parser.add_argument(
+        '-d', '--cache-folder',
+        dest='cache_folder',
+        required=True,
+        help='folder of the level of detail caches')
+    args = parser.parse_args()
+    for filename in args.file_list:
+        t_start = time.perf_counter()
+        lod = get_lod(filename, cache_folder=args.cache_folder)
+        points = {level: len(envelope[0])
+                  for level, envelope in lod.envelopes.items()}
+        print(f"{os.path.basename(filename)}{LOD_EXTENSION}: {points} bins "
+              f"per level in "
+              f"{time.perf_counter() - t_start:.2f} s")
+    sys.exit(0)
@@ -4,6 +4,9 @@ Log Station data into 2 different formats:
     sid_format (single column with time)
     supersid (multiple columns without time),
 
+SidJournal appends each reading to a binary file to restore the buffers
+after a crash.
+
 Eric Gibert
 
 Change tracking:
@@ -12,14 +15,102 @@ Change tracking:
     20150801:
         - truncate sid_params['utc_starttime'] to 19 first chars
 """
+import os
 import sys
+import time
+import struct
 from os import path
 from time import gmtime, strftime
+import numpy
 from sidfile import SidFile
 from supersid_config import FILTERED, RAW, CALL_SIGN, FREQUENCY
 from supersid_config import SID_FORMAT, SUPERSID_FORMAT
 
 
+class SidJournal():
+    """Append-only binary file of the readings of one day.
+
+    The header holds the log interval and the station list, followed by
+    fixed size records:
+        data_index  uint32
+        timestamp   int64, micro-seconds since the epoch (UTC)
+        strength    float64 per station
+    The file is flushed after each record and synced to the storage
+    every FSYNC_INTERVAL seconds.
+    """
+
+    MAGIC = b"SIDJ"
+    VERSION = 1
+    FSYNC_INTERVAL = 60     # seconds
+
+    def __init__(self, filename, stations, log_interval):
+        self.filename = filename
+        self.header = self.create_header(stations, log_interval)
+        self.dtype = numpy.dtype([('data_index', '<u4'),
+                                  ('timestamp', '<i8'),
+                                  ('strengths', '<f8', (len(stations),))])
+        self.record = struct.Struct("<Iq%dd" % len(stations))
+        self.fout = None
+        self.last_sync = 0
+
+    @classmethod
+    def create_header(cls, stations, log_interval):
+        station_list = ",".join(stations).encode()
+        return struct.pack("<4sHHIH", cls.MAGIC, cls.VERSION, len(stations),
+                           int(log_interval), len(station_list)) \
+            + station_list
+
+    def read(self):
+        """Return the complete records of the journal, None if unusable."""
+        if not path.isfile(self.filename):
+            return None
+        with open(self.filename, "rb") as fin:
+            if fin.read(len(self.header)) != self.header:
+                return None
+            raw = fin.read()
+        # a record torn by the crash is ignored
+        count = len(raw) // self.dtype.itemsize
+        return numpy.frombuffer(raw, dtype=self.dtype, count=count)
+
+    def open(self):
+        """Open the journal for appending, start a new one if unusable."""
+        records = self.read()
+        if records is None:
+            if path.isfile(self.filename):
+                print("Warning: unexpected header, journal", self.filename,
+                      "is renamed to", self.filename + ".old")
+                os.replace(self.filename, self.filename + ".old")
+            self.fout = open(self.filename, "wb")
+            self.fout.write(self.header)
+        else:
+            self.fout = open(self.filename, "r+b")
+            # continue after the last complete record
+            self.fout.seek(len(self.header)
+                           + len(records) * self.dtype.itemsize)
+            self.fout.truncate()
+        self.sync()
+
+    def append(self, data_index, utc_now, strengths):
+        self.fout.write(self.record.pack(
+            data_index,
+            round(utc_now.timestamp() * 1000000),
+            *strengths))
+        self.fout.flush()
+        if time.monotonic() - self.last_sync >= self.FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        self.fout.flush()
+        os.fsync(self.fout.fileno())
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.fout is not None:
+            self.sync()
+            self.fout.close()
+            self.fout = None
+
+
 class Logger():
     """
     Open the file with in memory buffer to record the future signal readings.
@@ -38,6 +129,7 @@ class Logger():
         self.version = "1.4 20150801"
         self.controller = controller
         self.config = controller.config
+        self.journal = None
         # first create in memory buffers
         if len(self.config.stations) == 1:
             # only one station to monitor, let's default to SID file format
@@ -54,11 +146,16 @@ class Logger():
         else:
             print("Error: no station to log???")
             sys.exit(5)
-        self.sid_file = SidFile(sid_params=self.config)
+        self.sid_file = SidFile(
+            sid_params=self.config,
+            buffers_filename=self.get_buffers_filename(self.config)
+            if self.config.get('mmap_buffers') == 'YES' else None)
 
         # Do we have a file to read from the command line by the user at launch
         if read_file:
-            sid_file2 = SidFile(filename=read_file)
+            # only the header is needed to decide, the data is read by
+            # copy_data()
+            sid_file2 = SidFile(filename=read_file, lazy=True)
             if sid_file2.sid_params['logtype'] != RAW:
                 print("The file type is not raw but",
                       sid_file2.sid_params['logtype'])
@@ -93,26 +190,134 @@ class Logger():
             print("Continue recording with data from file",
                   read_file, "included.")
 
-    def log_sid_format(self, stations, log_type=FILTERED, extended=False):
-        """One file per station. By default, buffered data is filtered."""
+    def log_sid_format(self, stations, log_type=FILTERED, extended=False,
+                       sid_file=None):
+        """One file per station. By default, buffered data is filtered.
+
+        sid_file may be a snapshot of self.sid_file to be written.
+        """
+        sid_file = sid_file or self.sid_file
         filenames = []
         for station in stations:
             my_filename = self.config['data_path'] \
-                + self.sid_file.get_sid_filename(station['call_sign'])
+                + sid_file.get_sid_filename(station['call_sign'])
             filenames.append(my_filename)
-            self.sid_file.write_data_sid(station, my_filename, log_type,
-                                         extended=extended,
-                                         bema_wing=self.config["bema_wing"])
+            sid_file.write_data_sid(station, my_filename, log_type,
+                                    extended=extended,
+                                    bema_wing=self.config["bema_wing"])
         return filenames
 
+    @staticmethod
+    def get_buffers_filename(config):
+        """Return <data_path>/current_buffers.mmap."""
+        return config['data_path'] + "current_buffers.mmap"
+
+    @staticmethod
+    def get_journal_filename(config, utc_starttime):
+        """Return <data_path>/<Site Name>_<UTC Start Date>.journal."""
+        return f"{config['data_path']}{config['site_name']}_" \
+            f"{utc_starttime[:10]}.journal"
+
+    @classmethod
+    def journal_starts_the_day(cls, config, utc_starttime):
+        """Return True if the day's journal holds the day's first reading.
+
+        Such a journal holds every reading of the hourly save, it does not
+        have to be read.
+        """
+        records = SidJournal(
+            cls.get_journal_filename(config, utc_starttime),
+            [station[CALL_SIGN] for station in config.stations],
+            config['log_interval']).read()
+        return records is not None and len(records) > 0 \
+            and records['data_index'][0] == 0
+
+    def create_journal(self):
+        """Return the SidJournal of the current day."""
+        return SidJournal(
+            self.get_journal_filename(self.config,
+                                      self.sid_file.sid_params['utc_starttime']),
+            self.sid_file.stations,
+            self.sid_file.LogInterval)
+
+    def open_journal(self):
+        """Append the readings to the journal of the current day."""
+        self.close_journal()
+        self.journal = self.create_journal()
+        self.journal.open()
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def remove_journal(self, utc_starttime):
+        """Delete the journal of a day whose files are written."""
+        filename = self.get_journal_filename(self.config, utc_starttime)
+        for journal_filename in (filename, filename + ".old"):
+            try:
+                os.remove(journal_filename)
+            except FileNotFoundError:
+                pass
+
+    def log_journal(self, data_index, utc_now, strengths):
+        if self.journal is not None:
+            self.journal.append(data_index, utc_now, strengths)
+
+    def restore_journal(self):
+        """Restore the buffers from the journal of the current day.
+
+        The journal readings overwrite the buffers, the readings before
+        the journal started (from the hourly save or the memory mapped
+        buffers) are kept. Return the number of restored readings.
+        """
+        records = self.create_journal().read()
+        if records is None or not len(records):
+            return 0
+        records = records[records['data_index'] < self.sid_file.data.shape[1]]
+        self.sid_file.data[:, records['data_index']] = records['strengths'].T
+        self.sid_file.set_timestamp(
+            records['data_index'],
+            records['timestamp'].view('datetime64[us]'))
+        return len(records)
+
+    def get_capture_stats_filename(self):
+        """Return <data_path>/<Site Name>_<UTC Start Date>.capture.json."""
+        return self.config['data_path'] \
+            + path.splitext(self.sid_file.get_supersid_filename())[0] \
+            + ".capture.json"
+
+    def log_capture_stats(self, capture_stats):
+        """Save the day's capture statistics next to the data files."""
+        my_filename = self.get_capture_stats_filename()
+        capture_stats.save(my_filename)
+        return [my_filename]
+
+    def get_timing_stats_filename(self):
+        """Return <data_path>/<Site Name>_<UTC Start Date>.timing.json."""
+        return self.config['data_path'] \
+            + path.splitext(self.sid_file.get_supersid_filename())[0] \
+            + ".timing.json"
+
+    def log_timing_stats(self, timing_stats):
+        """Save the day's timing statistics next to the data files."""
+        my_filename = self.get_timing_stats_filename()
+        timing_stats.save(my_filename)
+        return [my_filename]
+
     def log_supersid_format(self, stations, filename='',
-                            log_type=FILTERED, extended=False):
-        """Cascade all buffers in one file."""
+                            log_type=FILTERED, extended=False,
+                            sid_file=None):
+        """Cascade all buffers in one file.
+
+        sid_file may be a snapshot of self.sid_file to be written.
+        """
+        sid_file = sid_file or self.sid_file
         my_filename = filename \
             if filename and path.isabs(filename) \
             else self.config['data_path'] \
-            + (filename or self.sid_file.get_supersid_filename())
-        self.sid_file.write_data_supersid(my_filename, log_type,
-                                          extended=extended,
-                                          bema_wing=self.config["bema_wing"])
+            + (filename or sid_file.get_supersid_filename())
+        sid_file.write_data_supersid(my_filename, log_type,
+                                     extended=extended,
+                                     bema_wing=self.config["bema_wing"])
         return [my_filename]
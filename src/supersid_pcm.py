@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Decoding of raw PCM capture buffers into numpy arrays.
+
+The audio modules deliver the captured sound as a byte buffer of
+interleaved little endian samples:
+    for Channels = 1: [left, ..., left]
+    for Channels = 2: [left, right ..., left, right]
+
+decode_pcm() turns such a buffer into an array of shape (frames, channels)
+    for Channels = 1: [[left], ..., [left]]
+    for Channels = 2: [[left, right], ..., [left, right]]
+
+access the left channel as unpacked_data[:, 0]
+access the right channel as unpacked_data[:, 1]
+
+S16_LE and S32_LE are returned as read-only views on the buffer without
+copying. S24_3LE is widened to int32 with a vectorized sign extension.
+
+PcmBuffer is a preallocated byte buffer the audio periods are copied into
+in place. It is reused from one capture to the next, so capturing does not
+allocate and does not copy the growing buffer on every period.
+
+SampleRing is a ring buffer of decoded samples for the streaming capture.
+One thread writes the blocks read from the device, another one takes the
+latest frames without locking.
+
+Running this module directly compares the decoder with the former
+struct.unpack() based decoding.
+"""
+import sys
+import time
+import argparse
+from struct import unpack as st_unpack
+import numpy
+
+from supersid_config import S16_LE, S24_3LE, S32_LE
+
+# map ALSA format string to length of one sample in bytes
+FORMAT_LENGTHS = {
+    S16_LE: 2,
+    S24_3LE: 3,
+    S32_LE: 4,
+}
+
+# map ALSA format string to the numpy dtype of the decoded samples
+FORMAT_DTYPES = {
+    S16_LE: numpy.dtype('<i2'),
+    S24_3LE: numpy.dtype('<i4'),
+    S32_LE: numpy.dtype('<i4'),
+}
+
+
+def decode_pcm(raw_data, format, channels, frames=None):
+    """
+    Return the samples of raw_data as numpy array of shape (frames, channels).
+
+    raw_data may be bytes, bytearray or memoryview.
+    frames limits the number of decoded frames, excess data is ignored.
+    """
+    if format not in FORMAT_LENGTHS:
+        raise NotImplementedError(
+            "Format conversion for '{}' is not yet implemented!"
+            .format(format))
+    frame_size = FORMAT_LENGTHS[format] * channels
+    if frames is None:
+        frames = len(raw_data) // frame_size
+    elif frames * frame_size > len(raw_data):
+        raise ValueError(
+            "expected at least {} bytes for {} frames, got {}"
+            .format(frames * frame_size, frames, len(raw_data)))
+
+    if format == S24_3LE:
+        # place the 3 bytes of each sample in the upper bytes of an int32,
+        # the arithmetic right shift performs the sign extension
+        samples = numpy.frombuffer(raw_data, dtype=numpy.uint8,
+                                   count=frames * frame_size)
+        padded = numpy.zeros((frames * channels, 4), dtype=numpy.uint8)
+        padded[:, 1:] = samples.reshape((frames * channels, 3))
+        unpacked_data = padded.view(FORMAT_DTYPES[S24_3LE])[:, 0] >> 8
+    else:
+        unpacked_data = numpy.frombuffer(raw_data,
+                                         dtype=FORMAT_DTYPES[format],
+                                         count=frames * channels)
+    return unpacked_data.reshape((frames, channels))
+
+
+class PcmBuffer():
+    """Preallocated capture buffer, filled period by period."""
+
+    def __init__(self, num_bytes):
+        self.buffer = bytearray(num_bytes)
+        self.view = memoryview(self.buffer)
+        self.length = 0     # number of valid bytes in the buffer
+
+    def reset(self):
+        """Start filling the buffer from the beginning."""
+        self.length = 0
+
+    def is_full(self):
+        return self.length >= len(self.buffer)
+
+    def append(self, data):
+        """Copy data behind the valid bytes, excess data is dropped."""
+        num_bytes = min(len(data), len(self.buffer) - self.length)
+        self.view[self.length:self.length + num_bytes] = \
+            memoryview(data)[:num_bytes]
+        self.length += num_bytes
+        return num_bytes
+
+    def data(self):
+        """Return a memoryview on the valid bytes without copying them."""
+        return self.view[:self.length]
+
+
+class SampleRing():
+    """
+    Ring buffer of decoded frames for exactly one writer thread.
+
+    The writer announces the frames it is about to overwrite in 'reserved'
+    and publishes them by incrementing 'written' once they are in place.
+    The reader copies the frames it needs and verifies afterwards that the
+    writer did not touch them in the meantime. It retries at most
+    MAX_RETRIES times, a reader always overtaken raises BufferError.
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(self, capacity, channels, dtype):
+        self.capacity = capacity
+        self.buffer = numpy.zeros((capacity, channels), dtype=dtype)
+        self.written = 0    # total number of frames ever written
+        self.reserved = 0   # written + frames of the write in progress
+
+    def write(self, block):
+        """Append the frames of block, shape (frames, channels)."""
+        if len(block) > self.capacity:
+            # only the most recent frames fit into the ring
+            skipped = len(block) - self.capacity
+            block = block[skipped:]
+        else:
+            skipped = 0
+        self.reserved = self.written + skipped + len(block)
+        start = (self.written + skipped) % self.capacity
+        first = min(len(block), self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        self.buffer[:len(block) - first] = block[first:]
+        self.written += skipped + len(block)
+
+    def latest(self, frames, out=None):
+        """
+        Return the most recent frames, None if not enough have been written.
+
+        out may be a preallocated array of shape (frames, channels).
+        Raise BufferError if the writer overwrote the frames while they
+        were copied, MAX_RETRIES + 1 times in a row.
+        """
+        if frames > self.capacity:
+            raise ValueError(
+                "{} frames requested, the capacity is {}"
+                .format(frames, self.capacity))
+        if out is None:
+            out = numpy.empty((frames, self.buffer.shape[1]),
+                              dtype=self.buffer.dtype)
+        for _ in range(self.MAX_RETRIES + 1):
+            end = self.written
+            if end < frames:
+                return None
+            start = (end - frames) % self.capacity
+            first = min(frames, self.capacity - start)
+            out[:first] = self.buffer[start:start + first]
+            out[first:] = self.buffer[:frames - first]
+            if self.reserved - self.capacity <= end - frames:
+                # none of the copied frames was overwritten
+                return out
+        raise BufferError(
+            "the latest {} frames were overwritten while copying them"
+            .format(frames))
+
+
+def decode_pcm_struct(raw_data, format, channels, frames):
+    """Former struct.unpack() based decoding, kept as reference."""
+    if format == S16_LE:
+        unpacked_data = numpy.array(st_unpack(
+            "<%ih" % (frames * channels),
+            raw_data[:frames * channels * 2]))
+    elif format == S24_3LE:
+        unpacked_data = []
+        for i in range(frames * channels):
+            chunk = raw_data[i*3:i*3+3]
+            unpacked_data.append(st_unpack(
+                '<i',
+                chunk + (b'\0' if chunk[2] < 128 else b'\xff'))[0])
+        unpacked_data = numpy.array(unpacked_data)
+    elif format == S32_LE:
+        unpacked_data = numpy.array(st_unpack(
+            "<%ii" % (frames * channels),
+            raw_data[:frames * channels * 4]))
+    else:
+        raise NotImplementedError(
+            "Format conversion for '{}' is not yet implemented!"
+            .format(format))
+    return unpacked_data.reshape((frames, channels))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare decode_pcm() with the struct.unpack() decoder")
+    parser.add_argument(
+        "-s", "--sampling-rate",
+        help="sampling rate, default=192000",
+        type=int,
+        default=192000)
+    parser.add_argument(
+        "-n", "--channels",
+        help="number of channels, default=2",
+        choices=[1, 2],
+        type=int,
+        default=2)
+    parser.add_argument(
+        "-r", "--repeat",
+        help="number of repetitions, default=5",
+        type=int,
+        default=5)
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(0)
+    result = 0
+    for fmt, length in FORMAT_LENGTHS.items():
+        raw = rng.integers(
+            0, 256,
+            size=args.sampling_rate * args.channels * length,
+            dtype=numpy.uint8).tobytes()
+        timings = {}
+        for name, decoder in (('struct', decode_pcm_struct),
+                              ('numpy', decode_pcm)):
+            t_best = float('inf')
+            for _ in range(args.repeat):
+                t_start = time.perf_counter()
+                decoded = decoder(raw, fmt, args.channels, args.sampling_rate)
+                t_best = min(t_best, time.perf_counter() - t_start)
+            timings[name] = (t_best, decoded)
+        identical = numpy.array_equal(timings['struct'][1],
+                                      timings['numpy'][1])
+        if not identical:
+            result = 1
+        print("{:8s} {} Hz x {}: struct {:8.2f} ms, numpy {:8.3f} ms, "
+              "speedup {:7.1f}x, identical {}"
+              .format(fmt, args.sampling_rate, args.channels,
+                      timings['struct'][0] * 1000,
+                      timings['numpy'][0] * 1000,
+                      timings['struct'][0] / timings['numpy'][0],
+                      identical))
+    sys.exit(result)
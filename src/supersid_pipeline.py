@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Pipeline of worker threads connected by bounded queues.
+
+Each Stage runs its handler on the records of its input queue and passes
+the result to the next stage. A slow stage only delays itself: the stages
+before it continue until the queue in between is full. Then they block
+instead of dropping records, which is counted as back-pressure.
+
+    Pipeline(("dsp", dsp_handler), ("logging", logging_handler))
+
+A handler returns the record for the next stage or None to drop it.
+Pipeline.stop() lets the stages work off their queues before they end.
+
+Running this module directly demonstrates the back-pressure with a slow
+last stage.
+"""
+import sys
+import time
+import queue
+import threading
+import traceback
+
+
+class Stage(threading.Thread):
+    """Worker thread running handler on each record of its queue."""
+
+    _STOP = object()    # sentinel passed down the pipeline by stop()
+
+    def __init__(self, name, handler, queue_size, next_stage=None):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self.handler = handler
+        self.next_stage = next_stage
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0      # number of records handled
+        self.max_depth = 0      # maximum number of records waiting
+        self.blocked = 0        # number of puts which had to wait
+        self.blocked_time = 0.0     # seconds spent waiting for a free slot
+
+    def put(self, record):
+        """Queue record, wait for a free slot if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.blocked += 1
+            t_start = time.perf_counter()
+            self.queue.put(record)
+            self.blocked_time += time.perf_counter() - t_start
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            if record is self._STOP:
+                break
+            try:
+                result = self.handler(record)
+            except Exception:
+                # a failing record must not stop the stage
+                print(f"Warning: exception in pipeline stage '{self.name}'")
+                traceback.print_exc()
+                result = None
+            self.processed += 1
+            if result is not None and self.next_stage is not None:
+                self.next_stage.put(result)
+        if self.next_stage is not None:
+            self.next_stage.put(self._STOP)
+
+    def status(self):
+        return (f"{self.name}: depth={self.queue.qsize()} "
+                f"max={self.max_depth} blocked={self.blocked} "
+                f"({self.blocked_time:.1f}s)")
+
+
+class Pipeline:
+    """Chain of stages, records are submitted to the first one."""
+
+    QUEUE_SIZE = 10     # records waiting in front of each stage
+
+    def __init__(self, *handlers, queue_size=QUEUE_SIZE):
+        self.stages = []
+        next_stage = None
+        for name, handler in reversed(handlers):
+            next_stage = Stage(name, handler, queue_size, next_stage)
+            self.stages.insert(0, next_stage)
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, record):
+        """Pass record to the first stage, blocks while it is full."""
+        self.stages[0].put(record)
+
+    def stop(self, timeout=None):
+        """Finish the queued records and end the stages.
+
+        May be called from a stage, which is not waited for then.
+        """
+        self.stages[0].put(Stage._STOP)
+        for stage in self.stages:
+            if threading.current_thread() is not stage:
+                stage.join(timeout)
+
+    def backlog(self):
+        """Return True if records are waiting or a stage had to wait."""
+        return any(stage.queue.qsize() or stage.blocked
+                   for stage in self.stages)
+
+    def status(self):
+        """Queue depth and back-pressure of each stage."""
+        return ", ".join(stage.status() for stage in self.stages)
+
+
+if __name__ == '__main__':
+    def dsp(record):
+        return record * 2
+
+    def slow_logging(record):
+        time.sleep(0.02)
+        print(f"\rlogged {record:3d}", end='')
+
+    pipeline = Pipeline(("dsp", dsp), ("logging", slow_logging),
+                        queue_size=4)
+    for i in range(50):
+        pipeline.submit(i)
+    pipeline.stop()
+    print()
+    print(pipeline.status())
+    sys.exit(0 if pipeline.stages[-1].processed == 50 else 1)
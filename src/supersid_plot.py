@@ -50,8 +50,13 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders, utils
 import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 # SuperSID modules
-from sidfile import SidFile
+from sidarchive import SidArchive
+from supersid_lod import choose_level, Decimator
+from supersid_plot_common import (PAPER_SIZE, format_coord, m2hm,
+                                  m2yyyymmdd, read_plot_data)
 from supersid_config import read_config, print_config, CONFIG_FILE_NAME
 from supersid_common import exist_file
 
@@ -61,15 +66,6 @@ except Exception:
     clock = time.clock          # removed in Python 3.8
 
 
-PAPER_SIZE = {
-    'A3': (29.7 / 2.54, 42.0 / 2.54),
-    'A4': (21.0 / 2.54, 29.7 / 2.54),
-    'A5': (14.8 / 2.54, 21.0 / 2.54),
-    'LEGAL': (8.5, 14),
-    'LETTER': (8.5, 11)
-}
-
-
 def sendMail(config, To_mail, msgBody, PDFfile):
     """Send the mail using the smtplib module.
 
@@ -125,27 +121,18 @@ def sendMail(config, To_mail, msgBody, PDFfile):
     print(f"Email with {PDFfile} sent to {To_mail}.")
 
 
-def format_coord(x, y):
-    t = matplotlib.dates.num2date(x)
-    return f"(x, y) = ({t.year:04d}-{t.month:02d}-{t.day:02d} {t.hour:02d}:{t.minute:02d}, {y:0.2E})"
-
-
-def m2hm(x, _):
-    """Small function to format the time on horizontal axis, minor ticks"""
-    t = matplotlib.dates.num2date(x)
-    h = t.hour
-    m = t.minute
-    # only for odd hours
-    return '%(h)02d:%(m)02d' % {'h': h, 'm': m} if h % 2 == 1 else ''
-
-
-def m2yyyymmdd(x, _):
-    """Small function to format the date on horizontal axis, major ticks"""
-    t = matplotlib.dates.num2date(x)
-    y = t.year
-    m = t.month
-    d = t.day
-    return '%(y)04d-%(m)02d-%(d)02d' % {'y': y, 'm': m, 'd': d}
+def fetch_noaa_events(day):
+    """Return the lines of NOAA's events of day (YYYYMMDD), None on error."""
+    # NOAA_URL = 'http://www.swpc.noaa.gov/ftpdir/warehouse/%s/%s_events/%sevents.txt' % (day[:4], day[:4], day)
+    # ftp://ftp.swpc.noaa.gov/pub/indices/events/20141030events.txt
+    NOAA_URL = 'ftp://ftp.swpc.noaa.gov/pub/indices/events/%sevents.txt' % (day)
+    try:
+        with urllib.request.urlopen(NOAA_URL, timeout=60) as response:
+            return [str(webline, 'utf-8')
+                    for webline in response.read().splitlines()]
+    except (urllib.error.URLError, OSError) as err:
+        print(err, "\n", NOAA_URL)
+        return None
 
 
 class SUPERSID_PLOT():
@@ -172,6 +159,10 @@ class SUPERSID_PLOT():
         web=args.webData
         y_min = args.y_min
         y_max = args.y_max
+        full_resolution = getattr(args, 'full_resolution', False)
+        lod_cache = getattr(args, 'lod_cache', None)
+        archive_index = getattr(args, 'archive_index', None)
+        jobs = getattr(args, 'jobs', None) or os.cpu_count() or 1
 
         emailText = []
 
@@ -215,6 +206,31 @@ class SUPERSID_PLOT():
         current_axes.set_ylabel("Signal Strength")
         current_axes.format_coord = format_coord
 
+        # the headers come from the index of the files' folders, only new
+        # or modified files are read: the number of days gives the plot
+        # width, which decides on the level of detail to plot
+        archive = SidArchive(config.get("data_path"), archive_index)
+        for folder in sorted({os.path.dirname(os.path.abspath(filename))
+                              for filename in filenames}):
+            archive.update(folder)
+        rows = {row['path']: row for row in archive.files(
+            paths=[os.path.abspath(filename) for filename in filenames])}
+        headers = {}
+        for filename in filenames:
+            if os.path.abspath(filename) in rows:
+                headers[filename] = rows[os.path.abspath(filename)]
+            else:
+                print(f"Warning: {filename} is not a SID/SuperSID file")
+        filenames = list(headers)
+        if 0 == len(filenames):
+            sys.exit(f"{filelist} doesn't match any SID/SuperSID file")
+        nb_days = len({header['date'] for header in headers.values()})
+        height, width = PAPER_SIZE[config.get("paper_size", "")]
+        pixels = (width if nb_days == 1 else width * nb_days / 2.0) * fig.dpi
+        # raw readings are decimated to the pixel columns of the plot,
+        # and again to the visible ones when zooming in the displayed plot
+        decimator = Decimator(current_axes, pixels)
+
         # Get data from files
         maxData, data_length = -1, -1  # impossible values
 
@@ -232,11 +248,48 @@ class SUPERSID_PLOT():
         colorStation = {}
         colorIdx = 0
 
+        def load_readings(filename, station):
+            sid_file = archive.load(filename)
+            return sid_file.timestamp, sid_file.get_station_data(station)
+
         clock()
-        for filename in sorted(filenames):
-            figTitle.append(os.path.basename(filename)[:-4])    # .csv assumed
-            sFile = SidFile(filename)
-            for station in sFile.stations:
+        filenames = sorted(filenames)
+        # the envelopes are worth it only if they are cached, the readings
+        # are read anyway to build them
+        levels = [None if full_resolution or not lod_cache else
+                  choose_level(nb_days * 24 * 60 * 60, pixels,
+                               headers[filename]['interval'])
+                  for filename in filenames]
+        # NOAA's events of all days are fetched concurrently while the
+        # files are read in parallel
+        noaa_events = {}
+        with ThreadPoolExecutor(max_workers=max(jobs, 4)) as fetcher:
+            if web:
+                days = sorted({header['date'].replace("-", "")
+                               for header in headers.values()})
+                noaa_events = dict(zip(
+                    days, [fetcher.submit(fetch_noaa_events, day)
+                           for day in days]))
+            if jobs > 1 and len(filenames) > 1:
+                with ProcessPoolExecutor(
+                        max_workers=min(jobs, len(filenames))) as executor:
+                    plot_data = list(executor.map(
+                        read_plot_data, filenames, levels,
+                        [lod_cache] * len(filenames)))
+            else:
+                # the readings are shared with the zoom refinement
+                plot_data = [read_plot_data(
+                                 filename, level, lod_cache,
+                                 None if level else archive.load(filename))
+                             for filename, level in zip(filenames, levels)]
+            noaa_events = {day: future.result()
+                           for day, future in noaa_events.items()}
+
+        for filename, level, station_data in zip(filenames, levels,
+                                                 plot_data):
+            figTitle.append(os.path.splitext(os.path.basename(filename))[0])
+            header = headers[filename]
+            for station in station_data:
                 # Does this station already have a color? if not, reserve one
                 label = None
                 if station not in colorStation:
@@ -249,44 +302,50 @@ class SUPERSID_PLOT():
                             colorList[colorIdx % len(colorList)] + '-'
                         colorIdx += 1
                 # Add points to the plot
-                plt.plot(sFile.timestamp,
-                         sFile.get_station_data(station),
-                         colorStation[station],
-                         label=label)
+                if level:
+                    # min/max envelope of the bins, replaced by the
+                    # readings when zooming in
+                    timestamps, minimum, maximum, _ = station_data[station]
+                    decimator.plot_envelope(
+                        timestamps, minimum, maximum, level,
+                        functools.partial(load_readings, filename, station),
+                        colorStation[station], label=label)
+                    nb_points = 2 * len(timestamps)
+                    station_max = max(maximum)
+                else:
+                    timestamps, values = station_data[station]
+                    if full_resolution:
+                        plt.plot(timestamps, values, colorStation[station],
+                                 label=label)
+                    else:
+                        decimator.plot(timestamps, values,
+                                       colorStation[station], label=label)
+                    nb_points = len(values)
+                    station_max = max(values)
                 # Extra housekeeping
 
                 # maxData will be used later to put the XRA labels up
-                maxData = max(max(sFile.get_station_data(station)), maxData)
+                maxData = max(station_max, maxData)
 
                 msg = "[{}] {} points plotted after reading {}".format(
                     station,
-                    len(sFile.get_station_data(station)),
+                    nb_points,
                     os.path.basename(filename))
                 print(msg)
                 emailText.append(msg)
 
-                if web and sFile.startTime not in daysList:
+                if web and header['date'] not in daysList:
                     # get the XRA data from NOAA website to draw corresponding
                     # lines on the plot
                     # fetch that day's flares on NOAA as not previously
                     # accessed
-                    day = sFile.sid_params["utc_starttime"][:10].replace("-", "")
-                    # NOAA_URL = 'http://www.swpc.noaa.gov/ftpdir/warehouse/%s/%s_events/%sevents.txt' % (day[:4], day[:4], day)
-                    # ftp://ftp.swpc.noaa.gov/pub/indices/events/20141030events.txt
-                    NOAA_URL = 'ftp://ftp.swpc.noaa.gov/pub/indices/events/%sevents.txt' % (day)
-                    response = None
-                    try:
-                        response = urllib.request.urlopen(NOAA_URL)
-                    except urllib.error.HTTPError as err:
-                        print(err, "\n", NOAA_URL)
+                    day = header['date'].replace("-", "")
+                    weblines = noaa_events[day]
 
                     # save temporarly current number of XRA events in memory
                     lastXRAlen = len(XRAlist)
-                    if response:
-                        for webline in response.read().splitlines():
-                            if sys.version[0] >= '3':
-                                # cast bytes to str
-                                webline = str(webline, 'utf-8')
+                    if weblines:
+                        for webline in weblines:
                             fields = webline.split()
                             if ((len(fields) >= 9) and
                                     (not fields[0].startswith("#"))):
@@ -328,7 +387,7 @@ class SUPERSID_PLOT():
                     emailText.append(msg)
                     print(msg)
                 # keep track of the days
-                daysList.add(sFile.startTime)
+                daysList.add(header['date'])
 
         print("All files read in", clock(), "sec.")
 
@@ -385,6 +444,7 @@ class SUPERSID_PLOT():
             plt.show()
         if eMail:
             sendMail(config, eMail, "\n".join(emailText), pdf or 'Image.pdf')
+        archive.close()
 
 
 # -----------------------------------------------------------------------------
@@ -483,6 +543,34 @@ if __name__ == '__main__':
         default=float('NaN'),
         type=float,
         help="y axis maximum; default is auto")
+    parser.add_argument(
+        "-j", "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        help="Number of files read in parallel, default is the number of "
+        "CPUs. 1 reads them one after the other.")
+    parser.add_argument(
+        "--full-resolution",
+        action="store_true",
+        dest="full_resolution",
+        default=False,
+        help="Plot every reading instead of the minimum and maximum reading "
+        "per pixel column, which are selected again when zooming in.")
+    parser.add_argument(
+        "--lod-cache",
+        dest="lod_cache",
+        default=None,
+        help="Folder to cache min/max envelopes of the files in (as "
+        "*.lod.npz), plotted instead of the readings when there are more "
+        "than two per pixel. Speeds up the plots of long periods plotted "
+        "again. Default is no cache.")
+    parser.add_argument(
+        "--archive-index",
+        dest="archive_index",
+        default=None,
+        help="SQLite index of the SID/SuperSID files, updated with the "
+        "files to plot. Default is sidarchive.sqlite in data_path.")
     parser.add_argument(
         'file_list',
         metavar='file.csv',
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Plot helpers shared by supersid_plot.py and supersid_batch.py.
+
+This module does not import matplotlib.pyplot nor any backend: the
+worker processes of supersid_batch.py use the Agg canvas only and start
+faster without them.
+"""
+import matplotlib.dates
+
+from sidfile import SidFile
+from supersid_lod import get_lod
+
+PAPER_SIZE = {
+    'A3': (29.7 / 2.54, 42.0 / 2.54),
+    'A4': (21.0 / 2.54, 29.7 / 2.54),
+    'A5': (14.8 / 2.54, 21.0 / 2.54),
+    'LEGAL': (8.5, 14),
+    'LETTER': (8.5, 11)
+}
+
+
+def format_coord(x, y):
+    t = matplotlib.dates.num2date(x)
+    return f"(x, y) = ({t.year:04d}-{t.month:02d}-{t.day:02d} {t.hour:02d}:{t.minute:02d}, {y:0.2E})"
+
+
+def m2hm(x, _):
+    """Small function to format the time on horizontal axis, minor ticks"""
+    t = matplotlib.dates.num2date(x)
+    h = t.hour
+    m = t.minute
+    # only for odd hours
+    return '%(h)02d:%(m)02d' % {'h': h, 'm': m} if h % 2 == 1 else ''
+
+
+def m2yyyymmdd(x, _):
+    """Small function to format the date on horizontal axis, major ticks"""
+    t = matplotlib.dates.num2date(x)
+    y = t.year
+    m = t.month
+    d = t.day
+    return '%(y)04d-%(m)02d-%(d)02d' % {'y': y, 'm': m, 'd': d}
+
+
+def read_plot_data(filename, level, cache_folder=None, sid_file=None):
+    """Return {station: arrays to plot} of filename.
+
+    The arrays are (timestamps, data) or with a level of detail
+    (timestamps, minimum, maximum, mean) from the cache folder. Runs in a
+    worker process, only these arrays are passed back. sid_file may be the
+    SidFile of filename already read.
+    """
+    if sid_file is None:
+        sid_file = SidFile(filename, lazy=True)
+    if level:
+        lod = get_lod(filename, sid_file, cache_folder=cache_folder)
+        return {station: lod.get(station, level)
+                for station in sid_file.stations}
+    return {station: (sid_file.timestamp, sid_file.get_station_data(station))
+            for station in sid_file.stations}
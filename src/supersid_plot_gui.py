@@ -13,6 +13,7 @@
 
 """
 import os.path
+import queue
 import argparse
 import tkinter as tk
 from tkinter import ttk, SUNKEN, RAISED
@@ -22,13 +23,19 @@ from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
 from matplotlib.figure import Figure
 from matplotlib.ticker import FuncFormatter as ff
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import ephem
+import numpy
 
 from sidfile import SidFile
+from supersid_lod import Decimator
 from noaa_flares import NOAA_flares
 from supersid_common import exist_file
 from supersid_config import read_config, print_config, CONFIG_FILE_NAME
 
+NOAA_FETCH_JOBS = 4     # days of NOAA flares retrieved concurrently
+NOAA_POLL_MS = 100      # period of the check for retrieved days
+
 
 def format_coord(x, y):
     t = matplotlib.dates.num2date(x)
@@ -74,6 +81,18 @@ class PlotGui(ttk.Frame):
         self.hidden_stations = set()  # hide the graph if the station in set
         self.color_station = {}       # the color assigned to a station
         self.sid_files = []           # ordered list of sid files read
+        self.lines = {}               # (file index, station) -> Line2D
+        self.flare_artists = {}       # file index -> artists of its flares
+        self.noaa_shown = False       # state of the NOAA button
+        # NOAA's flares are retrieved by a pool of threads, the days
+        # retrieved are queued as (generation, day, xra_list) for the Tk
+        # thread; the results of a cancelled generation are ignored
+        self.noaa_executor = None
+        self.noaa_queue = queue.Queue()
+        self.noaa_generation = 0
+        self.noaa_pending = []        # futures of the current retrieval
+        self.noaa_done = 0            # days of the current retrieval
+        self.noaa_poll = None         # tk.after id of poll_noaa
         self.graph = None
         self.overlay = overlay
         self.init_gui(file_list)
@@ -110,23 +129,20 @@ class PlotGui(ttk.Frame):
         self.canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
         # Add data to the graph for each file
-        if self.overlay:
-            alpha_step = 1.0 / len(file_list)
-            alpha = alpha_step
-        else:
-            alpha = 1.0
         for filename in sorted(file_list):
             sid_file = SidFile(filename)
             if self.overlay:
                 sid_file.startTime = datetime.fromtimestamp(0, timezone.utc)
-                for i in range(len(sid_file.timestamp)):
-                    sid_file.timestamp[i] = sid_file.timestamp[i].replace(year=1970, month=1, day=1)
+                # keep the time of the day only
+                sid_file.timestamp = numpy.datetime64('1970-01-01', 'us') \
+                    + (sid_file.timestamp
+                       - sid_file.timestamp.astype('datetime64[D]'))
 
             # list will be populated if the user click on 'NOAA' button
             sid_file.xra_list = []
 
             self.sid_files.append(sid_file)
-            self.daysList[sid_file.startTime] = []
+            self.daysList[sid_file.startTime] = None    # not retrieved yet
             fig_title.append(os.path.basename(filename)[:-4])  # .csv assumed
             for station in set(sid_file.stations) - self.hidden_stations:
                 self.max_data = max(self.max_data,
@@ -141,14 +157,7 @@ class PlotGui(ttk.Frame):
                         self.color_station[station] = \
                             color_list[color_idx % len(color_list)] + '-'
                         color_idx += 1
-                # Add points to the plot
-                self.graph.xaxis.axis_date()
-                self.graph.plot(sid_file.timestamp,
-                                sid_file.get_station_data(station),
-                                self.color_station[station],
-                                alpha=alpha)
-            if self.overlay:
-                alpha += alpha_step
+        self.plot_curves()
 
         # add the buttons to show/add a station's curve
         for s, c in self.color_station.items():
@@ -182,27 +191,127 @@ class PlotGui(ttk.Frame):
                               bd=1, relief=tk.SUNKEN,  # anchor=tk.W,
                               textvariable=self.statusbar_txt,
                               font=('arial', 10, 'normal'), pady=5)
-        self.statusbar_txt.set(", ".join(fig_title))
+        self.title_txt = ", ".join(fig_title)
+        self.statusbar_txt.set(self.title_txt)
         self.label.pack(fill=tk.X)
 
         self.calc_ephem()   # calculate the sun rise/set for each file
         self.show_figure()  # add other niceties and show the plot
 
     def on_click_noaa(self, button):
-        for sid_file in self.sid_files:
-            if sid_file.xra_list:
-                sid_file.xra_list = []  # no longer to be displayed
-                button.configure(bg="lightgray", relief=RAISED)
-            elif self.daysList[sid_file.startTime]:
-                sid_file.xra_list = self.daysList[sid_file.startTime]
-                button.configure(bg="white", relief=SUNKEN)
-            else:
-                nf = NOAA_flares(sid_file.startTime)
-                nf.print_xra_list()
-                self.daysList[sid_file.startTime] = nf.get_xra_list()
-                sid_file.xra_list = self.daysList[sid_file.startTime]
-                button.configure(bg="white", relief=SUNKEN)
-        self.update_graph()
+        """Show or hide NOAA's flares, cancel their retrieval if running.
+
+        The days not retrieved yet are fetched in the background, their
+        flares are drawn as they arrive.
+        """
+        if self.noaa_pending or self.noaa_shown:
+            self.cancel_noaa()
+            self.noaa_shown = False
+            for index in list(self.flare_artists):
+                self.hide_flares(index)
+            button.configure(bg="lightgray", relief=RAISED)
+            self.canvas.draw_idle()
+            return
+        self.noaa_shown = True
+        button.configure(bg="white", relief=SUNKEN)
+        for index in range(len(self.sid_files)):
+            self.show_flares(index)
+        self.canvas.draw_idle()
+        days = sorted({sid_file.startTime for sid_file in self.sid_files
+                       if self.daysList[sid_file.startTime] is None})
+        if days:
+            if self.noaa_executor is None:
+                self.noaa_executor = ThreadPoolExecutor(
+                    max_workers=NOAA_FETCH_JOBS)
+            self.noaa_generation += 1
+            self.noaa_done = 0
+            self.noaa_pending = [
+                self.noaa_executor.submit(self.fetch_noaa,
+                                          self.noaa_generation, day)
+                for day in days]
+            self.poll_noaa()
+
+    def fetch_noaa(self, generation, day):
+        """Worker thread: retrieve the flares of day, queue them."""
+        try:
+            nf = NOAA_flares(day)   # from the cache folder if available
+            nf.print_xra_list()
+            xra_list = nf.get_xra_list()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            print(f"NOAA flares of {day:%Y-%m-%d} not retrieved: {err}")
+            xra_list = []
+        self.noaa_queue.put((generation, day, xra_list))
+
+    def poll_noaa(self):
+        """Draw the flares of the days retrieved so far, show the progress."""
+        retrieved = False
+        while True:
+            try:
+                generation, day, xra_list = self.noaa_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.noaa_generation:
+                continue    # retrieval cancelled
+            self.noaa_done += 1
+            self.daysList[day] = xra_list
+            for index, sid_file in enumerate(self.sid_files):
+                if sid_file.startTime == day:
+                    self.show_flares(index)
+            retrieved = True
+        if retrieved:
+            self.canvas.draw_idle()
+        if self.noaa_done < len(self.noaa_pending):
+            self.statusbar_txt.set(
+                f"NOAA flares: {self.noaa_done} of {len(self.noaa_pending)}"
+                " days retrieved, click NOAA to cancel")
+            self.noaa_poll = self.tk_root.after(NOAA_POLL_MS, self.poll_noaa)
+        else:
+            self.noaa_pending = []
+            self.noaa_poll = None
+            self.statusbar_txt.set(self.title_txt)
+
+    def cancel_noaa(self):
+        """Stop the retrieval: days not started are dropped, the running
+        ones complete in the background to the cache folder."""
+        for future in self.noaa_pending:
+            future.cancel()
+        self.noaa_pending = []
+        self.noaa_generation += 1
+        if self.noaa_poll is not None:
+            self.tk_root.after_cancel(self.noaa_poll)
+            self.noaa_poll = None
+        self.statusbar_txt.set(self.title_txt)
+
+    def show_flares(self, index):
+        """Draw the lines and box with intensity of the flares of a file."""
+        if self.overlay or not self.noaa_shown \
+                or index in self.flare_artists:
+            return
+        sid_file = self.sid_files[index]
+        sid_file.xra_list = self.daysList[sid_file.startTime] or []
+        _, top_max = self.graph.get_ylim()
+        artists = []
+        for eventName, BeginTime, MaxTime, EndTime, Particulars \
+                in sid_file.xra_list:
+            artists.append(self.graph.vlines(
+                [BeginTime, MaxTime, EndTime], 0,
+                self.max_data, color=['g', 'r', 'y'],
+                linestyles='dotted'))
+            artists.append(self.graph.text(
+                MaxTime,
+                self.max_data + (top_max - self.max_data) / 4.0,
+                Particulars, horizontalalignment='center',
+                bbox={
+                    'facecolor': 'w',
+                    'alpha': 0.5,
+                    'fill': True}))
+        if artists:
+            self.flare_artists[index] = artists
+
+    def hide_flares(self, index):
+        self.sid_files[index].xra_list = []  # no longer to be displayed
+        for artist in self.flare_artists.pop(index, []):
+            artist.remove()
 
     def on_click_station(self, station, button):
         """Invert the color of the button. Hide/draw corresponding graph."""
@@ -213,7 +322,36 @@ class PlotGui(ttk.Frame):
         else:
             self.hidden_stations.add(station)
             button.configure(bg="lightgray", relief=RAISED)
-        self.update_graph()
+        # the curves of all files stay on the graph, only their visibility
+        # changes: no need to plot again
+        for (_, line_station), line in self.lines.items():
+            if line_station == station:
+                line.set_visible(station not in self.hidden_stations)
+        self.canvas.draw_idle()
+
+    def plot_curves(self):
+        """Plot the curves of all files and stations, register their lines.
+
+        The curves of the hidden stations are plotted invisible, to be
+        shown by on_click_station.
+        """
+        if self.overlay:
+            alpha_step = 1.0 / len(self.sid_files)
+            alpha = alpha_step
+        else:
+            alpha = 1.0
+        # curves are decimated to the visible pixel columns
+        self.decimator = Decimator(self.graph)
+        self.lines = {}
+        self.graph.xaxis.axis_date()
+        for index, sid_file in enumerate(self.sid_files):
+            for station in sid_file.stations:
+                self.lines[(index, station)] = self.decimator.plot(
+                    sid_file.timestamp, sid_file.get_station_data(station),
+                    self.color_station[station], alpha=alpha,
+                    visible=station not in self.hidden_stations)
+            if self.overlay:
+                alpha += alpha_step
 
     def show_figure(self):
         """Cosmetics on the figure."""
@@ -238,23 +376,8 @@ class PlotGui(ttk.Frame):
 
         if not self.overlay:
             # specific drawings  linked to each sid_file: flares and sunrise/sunset
-            bottom_max, top_max = current_axes.get_ylim()
-            for sid_file in self.sid_files:
-                # for each flare, draw the lines and box with flares intensity
-                for eventName, BeginTime, MaxTime, EndTime, Particulars \
-                        in sid_file.xra_list:
-                    self.graph.vlines(
-                        [BeginTime, MaxTime, EndTime], 0,
-                        self.max_data, color=['g', 'r', 'y'],
-                        linestyles='dotted')
-                    self.graph.text(
-                        MaxTime,
-                        self.max_data + (top_max - self.max_data) / 4.0,
-                        Particulars, horizontalalignment='center',
-                        bbox={
-                            'facecolor': 'w',
-                            'alpha': 0.5,
-                            'fill': True})
+            for index, sid_file in enumerate(self.sid_files):
+                self.show_flares(index)
                 if (sid_file.rising is not None) \
                 and (sid_file.setting is not None):
                     # draw the rectangles for rising and setting of the sun.
@@ -264,40 +387,18 @@ class PlotGui(ttk.Frame):
                                            sid_file.rising.datetime(),
                                            facecolor='blue', alpha=0.1)
                         self.graph.axvspan(sid_file.setting.datetime(),
-                                           max(sid_file.timestamp),
+                                           sid_file.timestamp.max().item(),
                                            facecolor='blue', alpha=0.1)
                     else:
                         self.graph.axvspan(
                             max(sid_file.startTime,
                                 sid_file.setting.datetime()),
                             min(sid_file.rising.datetime(),
-                                max(sid_file.timestamp)),
+                                sid_file.timestamp.max().item()),
                             facecolor='blue', alpha=0.1)
 
         self.canvas.draw()
 
-    def update_graph(self):
-        """Redraw the selected stations on a clear graph"""
-        if self.overlay:
-            alpha_step = 1.0 / len(self.sid_files)
-            alpha = alpha_step
-        else:
-            alpha = 1.0
-        self.fig.clear()
-        self.graph = self.fig.add_subplot(111)
-        for sid_file in self.sid_files:
-            for station in set(sid_file.stations) - self.hidden_stations:
-                print(sid_file.startTime, station)
-                # Add points to the plot
-                self.graph.xaxis.axis_date()
-                self.graph.plot(sid_file.timestamp,
-                                sid_file.get_station_data(station),
-                                self.color_station[station],
-                                alpha=alpha)
-            if self.overlay:
-                alpha += alpha_step
-        self.show_figure()
-
     def calc_ephem(self):
         """Compute the night period of each SidFile using the ephem module."""
         sid_loc = ephem.Observer()
@@ -16,17 +16,25 @@ This 'device' can be a local sound card:
      - __init__: open the 'device' for future capture
      - capture_1sec: obtain one second of sound and return as an array
         of 'audio_sampling_rate' integers
+     - read_block: obtain the next block of sound for the streaming capture
      - close: close the 'device'
+
+With 'Streaming = yes' a StreamingCapture thread keeps reading blocks from
+the 'device' into a ring buffer, capture_1sec() then returns the latest
+second without waiting for the sound card.
 """
 import sys
+import json
 import time
 import argparse
+import threading
 import traceback
-from struct import unpack as st_unpack
+import numpy
 from numpy import array
-from matplotlib.mlab import psd as mlab_psd
 
 from supersid_config import FREQUENCY, S16_LE, S24_3LE, S32_LE
+from supersid_pcm import FORMAT_LENGTHS, PcmBuffer, SampleRing, decode_pcm
+from supersid_psd import psd
 
 
 def get_peak_freq(data, audio_sampling_rate):
@@ -35,7 +43,7 @@ def get_peak_freq(data, audio_sampling_rate):
     #        4096 for 192000
     # -> the frequency resolution is constant
     NFFT = max(1024, 1024 * audio_sampling_rate // 48000)
-    Pxx, freqs = mlab_psd(data, NFFT, audio_sampling_rate)
+    Pxx, freqs = psd(data, NFFT, audio_sampling_rate)
     m = max(Pxx)
     if m == min(Pxx):
         peak_freq = 0
@@ -84,13 +92,6 @@ try:
             S32_LE: alsaaudio.PCM_FORMAT_S32_LE,
         }
 
-        # map ALSAO format string to length of one sample in bytes
-        FORMAT_LENGTHS = {
-            S16_LE: 2,
-            S24_3LE: 3,
-            S32_LE: 4,
-        }
-
         def __init__(
                 self,
                 card,
@@ -111,6 +112,12 @@ try:
             self.format = format
             self.channels = channels
             self.audio_sampling_rate = audio_sampling_rate
+            self.periodsize = periodsize
+
+            # read problems since the device was opened
+            self.overruns = 0
+            self.zero_length_reads = 0
+            self.short_reads = 0
             if card != '':
                 # deprecated configuration keyword Card, use Device instead
                 # alsaaudio.PCM(card=card) deprecated since pyalsaaudio 0.8.0
@@ -161,6 +168,11 @@ try:
                                          device=device)
                 self.name = "alsaaudio '{}'".format(device)
 
+            # one second of raw data, reused for every capture
+            self.raw_buffer = PcmBuffer(FORMAT_LENGTHS[self.format]
+                                        * self.channels
+                                        * self.audio_sampling_rate)
+
         def capture_1sec(self):
             """
             return one second recording as numpy array
@@ -174,49 +186,48 @@ try:
 
             access the left channel as unpacked_data[:, 0]
             access the right channel as unpacked_data[:, 1]
+
+            the returned array may share memory with the capture buffer,
+            it is valid until the next call of capture_1sec()
             """
-            raw_data = b''
-            num_bytes = self.FORMAT_LENGTHS[self.format] \
-                * self.channels \
-                * self.audio_sampling_rate
+            self.raw_buffer.reset()
             t = time.time()
-            while len(raw_data) < num_bytes:
+            while not self.raw_buffer.is_full():
                 length, data = self.inp.read()
-                if length > 0:
-                    raw_data += data
+                if self.check_read(length) > 0:
+                    # truncate to one second, if we received too much
+                    self.raw_buffer.append(data)
             self.duration = time.time() - t
 
-            # truncate to one second, if we received too much
-            raw_data = raw_data[:num_bytes]
-
-            if self.format == S16_LE:
-                unpacked_data = array(st_unpack(
-                    "<%ih" % (self.audio_sampling_rate * self.channels),
-                    raw_data))
-                return unpacked_data.reshape((
-                    self.audio_sampling_rate,
-                    self.channels))
-            elif self.format == S24_3LE:
-                unpacked_data = []
-                for i in range(self.audio_sampling_rate * self.channels):
-                    chunk = raw_data[i*3:i*3+3]
-                    unpacked_data.append(st_unpack(
-                        '<i',
-                        chunk + (b'\0' if chunk[2] < 128 else b'\xff'))[0])
-                return array(unpacked_data).reshape((
-                    self.audio_sampling_rate,
-                    self.channels))
-            elif self.format == S32_LE:
-                unpacked_data = array(st_unpack(
-                    "<%ii" % (self.audio_sampling_rate * self.channels),
-                    raw_data))
-                return unpacked_data.reshape((
-                    self.audio_sampling_rate,
-                    self.channels))
-            else:
-                raise NotImplementedError(
-                    "Format conversion for '{}' is not yet implemented!"
-                    .format(self.format))
+            return decode_pcm(self.raw_buffer.data(), self.format,
+                              self.channels, self.audio_sampling_rate)
+
+        def read_block(self):
+            """
+            return the frames of one period for the streaming capture
+            as numpy array [[left, right], ..., [left, right]]
+            or None if nothing was read
+            """
+            length, data = self.inp.read()
+            if self.check_read(length) > 0:
+                return decode_pcm(data, self.format, self.channels, length)
+            return None
+
+        def check_read(self, length):
+            """
+            count the problems reported by PCM.read() and return length
+
+            In case of an overrun, PCM.read() returns a negative
+            size: -EPIPE. This indicates that data was lost.
+            Fewer frames than the periodsize are a short read.
+            """
+            if length < 0:
+                self.overruns += 1
+            elif length == 0:
+                self.zero_length_reads += 1
+            elif length < self.periodsize:
+                self.short_reads += 1
+            return length
 
         def close(self):
             pass  # to check later if there is something to do
@@ -295,6 +306,9 @@ try:
             S32_LE: 'int32',
         }
 
+        # number of frames read at once by the streaming capture
+        BLOCKSIZE = 1024
+
         def __init__(
                 self,
                 device_name,
@@ -327,6 +341,22 @@ try:
             sounddevice.default.dtype = 'int16'
             self.name = "sounddevice '{}'".format(self.device_name)
 
+            # one second of samples, reused for every capture
+            if self.format in [S16_LE, S32_LE]:
+                self.buffer = numpy.empty(
+                    (self.audio_sampling_rate, self.channels),
+                    dtype=self.FORMAT_MAP[self.format])
+            else:
+                self.buffer = None
+
+            # input stream of the streaming capture, opened on first use
+            self.stream = None
+
+            # read problems since the device was opened
+            self.overruns = 0
+            self.zero_length_reads = 0
+            self.short_reads = 0
+
         @staticmethod
         def query_input_devices():
             input_device_names = []
@@ -386,10 +416,8 @@ try:
             try:
                 t = time.time()
                 if self.format in [S16_LE, S32_LE]:
-                    unpacked_data = sounddevice.rec(
-                        frames=self.audio_sampling_rate,
-                        dtype=self.FORMAT_MAP[self.format],
-                        blocking=True).flatten()
+                    sounddevice.rec(out=self.buffer, blocking=True)
+                    unpacked_data = self.buffer.reshape(-1)
                 else:
                     # 'int24' is not supported by sounddevice.rec(),
                     # insetad sounddevice.RawInputStream() has to be used
@@ -408,8 +436,32 @@ try:
                 self.audio_sampling_rate,
                 self.channels))
 
+        def read_block(self):
+            """
+            return the frames of one block for the streaming capture
+            as numpy array [[left, right], ..., [left, right]]
+            """
+            if self.stream is None:
+                if self.format not in [S16_LE, S32_LE]:
+                    raise NotImplementedError(
+                        "'int24' is not supported by sounddevice.InputStream()")
+                self.stream = sounddevice.InputStream(
+                    dtype=self.FORMAT_MAP[self.format])
+                self.stream.start()
+            data, overflowed = self.stream.read(self.BLOCKSIZE)
+            if overflowed:
+                self.overruns += 1
+            if len(data) == 0:
+                self.zero_length_reads += 1
+            elif len(data) < self.BLOCKSIZE:
+                self.short_reads += 1
+            return data
+
         def close(self):
-            pass  # to check later if there is something to do
+            if self.stream is not None:
+                self.stream.stop()
+                self.stream.close()
+                self.stream = None
 
         def info(self):
             print(self.name, "at", self.audio_sampling_rate, "Hz")
@@ -490,13 +542,6 @@ try:
             S32_LE: pyaudio.paInt32,
         }
 
-        # map ALSAO format string to length of one sample in bytes
-        FORMAT_LENGTHS = {
-            S16_LE: 2,
-            S24_3LE: 3,
-            S32_LE: 4,
-        }
-
         def __init__(
                 self,
                 device_name,
@@ -520,6 +565,11 @@ try:
             self.format = format
             self.channels = channels
             self.CHUNK = 1024
+
+            # read problems since the device was opened
+            self.overruns = 0
+            self.zero_length_reads = 0
+            self.short_reads = 0
             self.pa_lib = pyaudio.PyAudio()
             self.device_name = device_name
             self.input_device_index = self.get_device_by_name(self.device_name)
@@ -534,6 +584,11 @@ try:
                 input_device_index=self.input_device_index)
             self.name = "pyaudio '{}'".format(device_name)
 
+            # one second of raw data, reused for every capture
+            self.raw_buffer = PcmBuffer(FORMAT_LENGTHS[self.format]
+                                        * self.channels
+                                        * self.audio_sampling_rate)
+
         @staticmethod
         def query_input_devices():
             input_device_names = []
@@ -587,62 +642,70 @@ try:
 
             access the left channel as unpacked_data[:, 0]
             access the right channel as unpacked_data[:, 1]
+
+            the returned array may share memory with the capture buffer,
+            it is valid until the next call of capture_1sec()
             """
             t = time.time()
-            raw_data = bytearray(self.capture(1))
+            raw_data = self.capture(1)
             self.duration = time.time() - t
-            if self.format == S16_LE:
-                unpacked_data = array(st_unpack(
-                    "<%ih" % (self.audio_sampling_rate * self.channels),
-                    raw_data))
-                return unpacked_data.reshape((
-                    self.audio_sampling_rate,
-                    self.channels))
-            elif self.format == S24_3LE:
-                unpacked_data = []
-                for i in range(self.audio_sampling_rate * self.channels):
-                    chunk = raw_data[i*3:i*3+3]
-                    unpacked_data.append(st_unpack(
-                        '<i',
-                        chunk + (b'\0' if chunk[2] < 128 else b'\xff'))[0])
-                return array(unpacked_data).reshape((
-                    self.audio_sampling_rate,
-                    self.channels))
-            elif self.format == S32_LE:
-                unpacked_data = array(st_unpack(
-                    "<%ii" % (self.audio_sampling_rate * self.channels),
-                    raw_data))
-                return unpacked_data.reshape((
-                    self.audio_sampling_rate,
-                    self.channels))
-            else:
-                raise NotImplementedError(
-                    "Format conversion for '{}' is not yet implemented!"
-                    .format(self.format))
+            return decode_pcm(raw_data, self.format, self.channels,
+                              self.audio_sampling_rate)
 
         def capture(self, secs):
-            frames = []
-            expected_number_of_bytes = self.FORMAT_LENGTHS[self.format] \
+            """
+            return the raw data of secs seconds as memoryview
+
+            one second captures reuse the preallocated buffer
+            """
+            expected_number_of_bytes = FORMAT_LENGTHS[self.format] \
                 * self.audio_sampling_rate \
                 * self.channels \
                 * secs
-            while len(frames) < expected_number_of_bytes:
+            if expected_number_of_bytes == len(self.raw_buffer.buffer):
+                frames = self.raw_buffer
+                frames.reset()
+            else:
+                frames = PcmBuffer(expected_number_of_bytes)
+            while not frames.is_full():
                 try:
                     # TODO: investigate exception_on_overflow=True
                     # ignoring overflows seems not to be the best idea
                     data = self.pa_stream.read(
                         self.CHUNK,
                         exception_on_overflow=False)
-                    frames.extend(data)
+                    self.check_read(data)
+                    frames.append(data)
                 except IOError as err:
                     print("IOError reading device:", str(err))
                     if -9981 == err.errno:
+                        self.overruns += 1
                         # -9981 is input overflow. This should not happen
                         # with exception_on_overflow=False
                         pass
                     else:
                         break   # avoid an endless loop, i.e. with error -9988
-            return frames[:expected_number_of_bytes]
+            return frames.data()
+
+        def read_block(self):
+            """
+            return the frames of one chunk for the streaming capture
+            as numpy array [[left, right], ..., [left, right]]
+            """
+            data = self.pa_stream.read(
+                self.CHUNK,
+                exception_on_overflow=False)
+            self.check_read(data)
+            return decode_pcm(data, self.format, self.channels)
+
+        def check_read(self, data):
+            """count the empty and the incomplete chunks"""
+            if len(data) == 0:
+                self.zero_length_reads += 1
+            elif len(data) < (self.CHUNK
+                              * self.channels
+                              * FORMAT_LENGTHS[self.format]):
+                self.short_reads += 1
 
         def close(self):
             self.pa_stream.stop_stream()
@@ -692,6 +755,189 @@ except ImportError:
     print("PyAudio not installed")
 
 
+class CaptureStats():
+    """Count the read problems of the capture device per tick and per day.
+
+    update() is called by the capture and returns the counts of the tick,
+    record() adds them to the day with the reading in the logging stage of
+    the pipeline, which also calls clear() and save(). status() is called
+    by the viewers, hence the lock.
+    """
+
+    # per tick flags
+    OVERRUN = 1
+    ZERO_LENGTH = 2
+    SHORT_READ = 4
+    CAPTURE_FAILED = 8
+    FLAG_NAMES = {
+        OVERRUN: 'overrun',
+        ZERO_LENGTH: 'zero_length',
+        SHORT_READ: 'short_read',
+        CAPTURE_FAILED: 'capture_failed',
+    }
+
+    def __init__(self):
+        self.last_counters = (0, 0, 0)
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Start the statistics of a new day."""
+        with self.lock:
+            self.ticks = 0
+            self.overruns = 0
+            self.zero_length_reads = 0
+            self.short_reads = 0
+            self.failed_captures = 0
+            self.flagged_ticks = []     # [(data_index, utc time, flag names)]
+
+    def update(self, capture_device, failed=False):
+        """Return the counts of this tick from the device counters.
+
+        That is (overruns, zero_length_reads, short_reads, failed).
+        """
+        counters = (getattr(capture_device, 'overruns', 0),
+                    getattr(capture_device, 'zero_length_reads', 0),
+                    getattr(capture_device, 'short_reads', 0))
+        overruns, zero_length_reads, short_reads = \
+            (now - last for now, last in zip(counters, self.last_counters))
+        self.last_counters = counters
+        return (overruns, zero_length_reads, short_reads, failed)
+
+    @classmethod
+    def flags(cls, tick_counts):
+        """Return the flags of the counts of a tick returned by update()."""
+        overruns, zero_length_reads, short_reads, failed = tick_counts
+        flags = 0
+        if overruns:
+            flags |= cls.OVERRUN
+        if zero_length_reads:
+            flags |= cls.ZERO_LENGTH
+        if short_reads:
+            flags |= cls.SHORT_READ
+        if failed:
+            flags |= cls.CAPTURE_FAILED
+        return flags
+
+    def record(self, data_index, utc_now, tick_counts):
+        """Add the counts of a tick, remember it if it is unreliable.
+
+        Return the flags of the tick.
+        """
+        overruns, zero_length_reads, short_reads, failed = tick_counts
+        flags = self.flags(tick_counts)
+        with self.lock:
+            self.ticks += 1
+            self.overruns += overruns
+            self.zero_length_reads += zero_length_reads
+            self.short_reads += short_reads
+            if failed:
+                self.failed_captures += 1
+            if flags:
+                self.flagged_ticks.append((data_index,
+                                           str(utc_now),
+                                           self.flag_names(flags)))
+        return flags
+
+    @classmethod
+    def flag_names(cls, flags):
+        return [name for flag, name in cls.FLAG_NAMES.items() if flags & flag]
+
+    def status(self):
+        """Short text for the status display, empty if all went well."""
+        with self.lock:
+            if not (self.overruns or self.zero_length_reads
+                    or self.short_reads or self.failed_captures):
+                return ""
+            return (f"xrun={self.overruns} zero={self.zero_length_reads} "
+                    f"short={self.short_reads} "
+                    f"failed={self.failed_captures}")
+
+    def summary(self):
+        with self.lock:
+            return {
+                'ticks': self.ticks,
+                'overruns': self.overruns,
+                'zero_length_reads': self.zero_length_reads,
+                'short_reads': self.short_reads,
+                'failed_captures': self.failed_captures,
+                'flagged_ticks': list(self.flagged_ticks),
+            }
+
+    def save(self, filename):
+        with open(filename, "wt", encoding="utf-8") as fout:
+            json.dump(self.summary(), fout, indent=1)
+
+    def load(self, filename):
+        """Continue counting with the summary saved earlier today."""
+        with open(filename, "rt", encoding="utf-8") as fin:
+            summary = json.load(fin)
+        with self.lock:
+            self.ticks = summary['ticks']
+            self.overruns = summary['overruns']
+            self.zero_length_reads = summary['zero_length_reads']
+            self.short_reads = summary['short_reads']
+            self.failed_captures = summary['failed_captures']
+            self.flagged_ticks = [tuple(tick)
+                                  for tick in summary['flagged_ticks']]
+
+
+class StreamingCapture(threading.Thread):
+    """Read the capture device continuously into a SampleRing."""
+
+    def __init__(self, capture_device, capacity):
+        threading.Thread.__init__(self, daemon=True)
+        self.capture_device = capture_device
+        self.capacity = capacity
+        self.ring = None        # created with the dtype of the first block
+        self.error = None       # exception which terminated the capture
+        self._stop_event = threading.Event()
+        self._latest = {}       # preallocated output arrays per size
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                block = self.capture_device.read_block()
+                if block is None or len(block) == 0:
+                    continue
+                if self.ring is None:
+                    self.ring = SampleRing(self.capacity,
+                                           self.capture_device.channels,
+                                           block.dtype)
+                self.ring.write(block)
+        except Exception as err:
+            self.error = err
+
+    def latest(self, frames, timeout=2.0):
+        """
+        Return the most recent frames, wait for them after the start.
+
+        The returned array is reused, it is valid until the next call
+        of latest() with the same number of frames.
+        """
+        t_end = time.time() + timeout
+        while True:
+            if self.error is not None:
+                raise self.error
+            if self.ring is not None:
+                if frames not in self._latest:
+                    self._latest[frames] = numpy.empty(
+                        (frames, self.ring.buffer.shape[1]),
+                        dtype=self.ring.buffer.dtype)
+                data = self.ring.latest(frames, self._latest[frames])
+                if data is not None:
+                    return data
+            if time.time() > t_end:
+                raise TimeoutError(
+                    "streaming capture delivered less than {} frames"
+                    .format(frames))
+            time.sleep(0.01)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+
+
 class Sampler():
     """Sampler will gather sound capture from various devices."""
 
@@ -701,6 +947,10 @@ class Sampler():
         self.monitored_channels = []
         self.monitored_bins = []
         self.data = []
+        self.stats = CaptureStats()
+        # CaptureStats counts and flags of the latest capture
+        self.tick_counts = (0, 0, 0, False)
+        self.tick_flags = 0
 
         # Remember constructor parameters
         self.controller = controller
@@ -759,6 +1009,17 @@ class Sampler():
         if self.sampler_ok:
             print("-", self.capture_device.name)
 
+        # optional continuous capture, the ring buffer holds one interval
+        # plus one second so that the latest second is always complete
+        self.stream = None
+        if self.sampler_ok and controller.config.get('Streaming') == 'YES':
+            self.stream = StreamingCapture(
+                self.capture_device,
+                self.audio_sampling_rate
+                * (controller.config['log_interval'] + 1))
+            self.stream.start()
+            print("- streaming capture started")
+
     def set_monitored_frequencies(self, stations):
         self.monitored_channels = []
         self.monitored_bins = []
@@ -773,8 +1034,33 @@ class Sampler():
     def capture_1sec(self):
         """Capture 1 second of data, returned data as an array
         """
+        return self.capture(self.audio_sampling_rate)
+
+    def capture(self, frames):
+        """Capture 'frames' frames of data, returned data as an array
+
+        Without streaming only one second can be captured. With streaming
+        the latest frames are taken from the ring buffer, up to one
+        log_interval plus one second.
+        """
         try:
-            self.data = self.capture_device.capture_1sec()
+            if self.stream is not None:
+                t = time.time()
+                self.data = self.stream.latest(frames)
+                self.capture_device.duration = time.time() - t
+            elif frames == self.audio_sampling_rate:
+                self.data = self.capture_device.capture_1sec()
+            else:
+                raise ValueError(
+                    "capturing {} frames requires Streaming = yes"
+                    .format(frames))
+        except BufferError as err:
+            # the ring buffer was overwritten faster than it was read:
+            # this capture failed, the next one may succeed
+            print(err, "- capture failed")
+            self.data = []
+            self.tick_counts = self.stats.update(self.capture_device,
+                                                 failed=True)
         except Exception as err:
             self.sampler_ok = False
             print(
@@ -782,15 +1068,21 @@ class Sampler():
                 "Failed to read data from audio using "
                 + self.capture_device.name)
             self.data = []
+            self.tick_counts = self.stats.update(self.capture_device,
+                                                 failed=True)
         else:
+            self.tick_counts = self.stats.update(self.capture_device)
             # Scale A/D raw_data to voltage here
             # Might substract 5v to make the data look more like SID
             if(self.scaling_factor != 1.0):
                 self.data = self.data * self.scaling_factor
+        self.tick_flags = self.stats.flags(self.tick_counts)
 
         return self.data
 
     def close(self):
+        if self.stream is not None:
+            self.stream.stop()
         if "capture_device" in dir(self):
             self.capture_device.close()
 
@@ -16,11 +16,11 @@ Works with pyaudio only.
 import sys
 from time import sleep
 import argparse
-from matplotlib.mlab import psd as mlab_psd
 
 # SuperSID Package classes
 from sidtimer import SidTimer
 from supersid_sampler import Sampler
+from supersid_psd import get_psd_engine
 from supersid_config import read_config, CONFIG_FILE_NAME
 from supersid_logger import Logger
 from textsidviewer import textSidViewer
@@ -58,6 +58,10 @@ class SuperSID_scanner():
             }
             self.config.stations.append(new_station)
 
+        # the scanner's artificial stations must not replace the
+        # memory mapped buffers of the monitor
+        self.config['mmap_buffers'] = 'NO'
+
         # Create Logger -
         # Logger will read an existing file if specified
         # as -r|--read script argument
@@ -136,7 +140,7 @@ class SuperSID_scanner():
                 self.config.stations,
                 signal_strengths):
             station['raw_buffer'][current_index] = strength
-        self.logger.sid_file.timestamp[current_index] = utc_now
+        self.logger.sid_file.set_timestamp(current_index, utc_now)
 
         # did we complete the expected scanning duration?
         if self.timer.time_now >= self.scan_end_time:
@@ -155,13 +159,14 @@ class SuperSID_scanner():
         self.viewer.status_display(message)
 
     def get_psd(self, data, nfft, fs):
-        """Call 'psd', calculates the spectrum."""
+        """Calculate the spectrum of all channels.
+
+        pxx[channel] is the spectrum of one channel, pxx is reused by the
+        next call.
+        """
         try:
-            pxx = {}
-            freqs = []
-            for channel in range(self.config['Channels']):
-                pxx[channel], freqs = \
-                    mlab_psd(data[:, channel], NFFT=nfft, Fs=fs)
+            pxx, freqs = get_psd_engine(nfft, fs).psd(
+                data[:, :self.config['Channels']])
         except RuntimeError as err_re:
             print("Warning:", err_re)
             pxx, freqs = None, None